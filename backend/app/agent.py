@@ -1,15 +1,25 @@
 """Single agent orchestration: intent routing and response generation."""
 
+import asyncio
+import os
+from collections.abc import AsyncIterator
 from typing import Any
 
-from .llm import chat_completion, describe_image
-from .retrieval import search_products
+from .embeddings import compute_embedding_async
+from .filters import SearchFilters, parse_filters
+from .intent import INTENT_CLASSIFIER, INTENT_MIN_CONFIDENCE, classify_intent
+from .llm import chat_completion, chat_completion_stream, describe_image
+from .response_cache import RESPONSE_CACHE, SemanticResponseCache
+from .retrieval import search_products_async
 
 # --- Intents (strict, spec-aligned) ---
 INTENT_SEARCH = "SEARCH"
 INTENT_CHAT = "CHAT"
 INTENT_IMAGE_SEARCH = "IMAGE_SEARCH"
 
+# Run retrieval concurrently with intent detection; the search is discarded on CHAT
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") != "0"
+
 SYSTEM_PROMPT = """You are Palona, a friendly AI shopping assistant like Amazon Rufus.
 You can:
 1. Have general conversations - introduce yourself, answer questions about your capabilities
@@ -29,10 +39,20 @@ INTENT_DETECTION_PROMPT = """Classify the user's intent. Reply with EXACTLY one
 Reply with only: CHAT or SEARCH. No other text."""
 
 
-async def detect_intent(message: str, has_image: bool) -> str:
-    """Detect user intent. Returns one of SEARCH, CHAT, IMAGE_SEARCH."""
+async def detect_intent(
+    message: str, has_image: bool, catalog: list[dict[str, Any]] | None = None
+) -> str:
+    """
+    Detect user intent. Returns one of SEARCH, CHAT, IMAGE_SEARCH.
+    The local classifier decides confident cases; the LLM is only asked below
+    INTENT_MIN_CONFIDENCE (or always, with INTENT_CLASSIFIER=llm).
+    """
     if has_image:
         return INTENT_IMAGE_SEARCH
+    if INTENT_CLASSIFIER == "local":
+        intent, confidence = classify_intent(message, catalog)
+        if confidence >= INTENT_MIN_CONFIDENCE:
+            return intent
 
     messages = [
         {"role": "system", "content": INTENT_DETECTION_PROMPT},
@@ -45,6 +65,52 @@ async def detect_intent(message: str, has_image: bool) -> str:
     return INTENT_CHAT
 
 
+_response_cache = SemanticResponseCache()
+
+
+def response_cache_stats() -> dict:
+    """Hit/miss counters for the semantic response cache."""
+    return _response_cache.stats()
+
+
+def _search_query(query: str) -> tuple[str, SearchFilters]:
+    """Text to embed for a search message, plus the hard filters parsed out of it."""
+    search_query_used = query
+    if "," in query and any(
+        w in query.lower() for w in ("how", "what", "reviews", "ratings", "specs", "compare")
+    ):
+        before_comma = query.split(",")[0].strip()
+        if len(before_comma) > 10:
+            search_query_used = before_comma
+    # "under $100", "4+ stars" become hard filters instead of prose for the LLM to apply
+    return parse_filters(search_query_used)
+
+
+async def _search(query: str, catalog: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    search_query_used, filters = _search_query(query)
+    return await search_products_async(search_query_used, catalog, top_k=5, filters=filters)
+
+
+def _discard(task: asyncio.Task) -> None:
+    """Cancel a speculative search, swallowing whatever it ends with."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _cache_embedding(message: str, catalog: list[dict[str, Any]]) -> list[float] | None:
+    """Embedding used as the response-cache key; None (cache bypassed) if embedding fails."""
+    try:
+        return await compute_embedding_async(message, catalog=catalog)
+    except Exception:
+        return None
+
+
+def _locally_search(message: str, catalog: list[dict[str, Any]]) -> bool:
+    """True when the local classifier confidently calls the message a SEARCH."""
+    intent, confidence = classify_intent(message, catalog)
+    return intent == INTENT_SEARCH and confidence >= INTENT_MIN_CONFIDENCE
+
+
 def _is_follow_up(message: str, previous_products: list) -> bool:
     """Check if message explicitly references previous products (e.g. 'the first one', 'compare them')."""
     if not previous_products:
@@ -59,7 +125,7 @@ def _is_follow_up(message: str, previous_products: list) -> bool:
     return any(p in msg for p in follow_up_phrases)
 
 
-async def process_message(
+async def _prepare_turn(
     message: str,
     image_base64: str | None,
     catalog: list[dict[str, Any]],
@@ -67,9 +133,8 @@ async def process_message(
     previous_products: list[dict[str, Any]] | None = None,
 ) -> dict[str, Any]:
     """
-    Process user message (and optional image) through the unified agent.
-    Uses chat history for conversational context.
-    Returns {response, products, intent}.
+    Everything before answer generation: intent, retrieval and the LLM prompt.
+    Returns {intent, products, llm_messages, cache}, or {result} on a response-cache hit.
     """
     history = history or []
     previous_products = previous_products or []
@@ -77,37 +142,64 @@ async def process_message(
 
     has_image = bool(image_base64 and image_base64.strip())
 
+    # Only first turns are cacheable: with history, the same words can mean something else.
+    # Only SEARCH answers are ever stored, so skip the embedding unless the local call says SEARCH.
+    cache_emb = None
+    cache_filters: tuple = ()
+    version = getattr(catalog, "version", "")
+    if (
+        RESPONSE_CACHE
+        and not has_image
+        and not history
+        and not previous_products
+        and (message or "").strip()
+        and _locally_search(message, catalog)
+    ):
+        cache_emb = await _cache_embedding(message, catalog)
+        if cache_emb is not None:
+            cache_filters = _search_query(message)[1].key()
+            cached = _response_cache.get(cache_emb, cache_filters, version)
+            if cached is not None:
+                return {"result": cached}
+    cache = (message, cache_emb, cache_filters, version) if cache_emb is not None else None
+
     search_query = message or ""
+    use_previous = not has_image and _is_follow_up(message, previous_products)
+    speculative: asyncio.Task | None = None
     if has_image:
         search_query = await describe_image(image_base64)
         intent = INTENT_IMAGE_SEARCH
     else:
-        intent = await detect_intent(message, False)
+        if SPECULATIVE_RETRIEVAL and not use_previous and search_query:
+            # Embed + search while the intent is decided: SEARCH turns wait max(intent, search)
+            speculative = asyncio.create_task(_search(search_query, catalog))
+        try:
+            # A reference to the products just shown is a product question, whatever the classifier says
+            intent = INTENT_SEARCH if use_previous else await detect_intent(message, False, catalog)
+        except BaseException:
+            if speculative is not None:
+                _discard(speculative)
+            raise
 
     # Route by intent
     if intent == INTENT_CHAT:
+        if speculative is not None:
+            _discard(speculative)
         llm_messages = [
             {"role": "system", "content": SYSTEM_PROMPT},
             *[{"role": h["role"], "content": h["content"]} for h in history],
             {"role": "user", "content": message or "Hello!"},
         ]
-        response = await chat_completion(llm_messages)
-        return {"response": response, "products": [], "intent": intent}
+        return {"intent": intent, "products": [], "llm_messages": llm_messages, "cache": None}
 
     # SEARCH or IMAGE_SEARCH: use ChromaDB retrieval
     query = search_query if search_query else message
-    use_previous = not has_image and _is_follow_up(message, previous_products)
     if use_previous:
         products = previous_products[:5]
+    elif speculative is not None:
+        products = await speculative
     else:
-        search_query_used = query
-        if "," in query and any(
-            w in query.lower() for w in ("how", "what", "reviews", "ratings", "specs", "compare")
-        ):
-            before_comma = query.split(",")[0].strip()
-            if len(before_comma) > 10:
-                search_query_used = before_comma
-        products = search_products(search_query_used, catalog, top_k=5)
+        products = await _search(query, catalog)
 
     def _product_context(p: dict[str, Any]) -> str:
         parts = [f"Name: {p.get('name', '')}", f"Price: {p.get('price', '')}"]
@@ -168,10 +260,62 @@ Instructions:
         *[{"role": h["role"], "content": h["content"]} for h in history],
         {"role": "user", "content": current_turn},
     ]
-    response = await chat_completion(llm_messages)
+    return {"intent": intent, "products": products, "llm_messages": llm_messages, "cache": cache}
 
-    return {
+
+def _finish_turn(turn: dict[str, Any], response: str) -> dict[str, Any]:
+    result = {
         "response": response,
-        "products": products,
-        "intent": intent,
+        "products": turn["products"],
+        "intent": turn["intent"],
     }
+    if turn["cache"] is not None and turn["intent"] == INTENT_SEARCH:
+        message, cache_emb, cache_filters, version = turn["cache"]
+        _response_cache.put(message, cache_emb, cache_filters, version, result)
+    return result
+
+
+async def process_message(
+    message: str,
+    image_base64: str | None,
+    catalog: list[dict[str, Any]],
+    history: list[dict[str, str]] | None = None,
+    previous_products: list[dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    """
+    Process user message (and optional image) through the unified agent.
+    Uses chat history for conversational context.
+    Returns {response, products, intent}.
+    """
+    turn = await _prepare_turn(message, image_base64, catalog, history, previous_products)
+    if "result" in turn:
+        return turn["result"]
+    response = await chat_completion(turn["llm_messages"])
+    return _finish_turn(turn, response)
+
+
+async def process_message_stream(
+    message: str,
+    image_base64: str | None,
+    catalog: list[dict[str, Any]],
+    history: list[dict[str, str]] | None = None,
+    previous_products: list[dict[str, Any]] | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Streaming process_message. Yields {"type": "meta", intent, products} as soon as
+    retrieval is done, then {"type": "token", text} per LLM chunk, then
+    {"type": "done", response, products, intent}.
+    """
+    turn = await _prepare_turn(message, image_base64, catalog, history, previous_products)
+    if "result" in turn:
+        result = turn["result"]
+        yield {"type": "meta", "intent": result["intent"], "products": result["products"]}
+        yield {"type": "token", "text": result["response"]}
+        yield {"type": "done", **result}
+        return
+    yield {"type": "meta", "intent": turn["intent"], "products": turn["products"]}
+    parts: list[str] = []
+    async for text in chat_completion_stream(turn["llm_messages"]):
+        parts.append(text)
+        yield {"type": "token", "text": text}
+    yield {"type": "done", **_finish_turn(turn, "".join(parts).strip())}
@@ -0,0 +1,167 @@
+"""Approximate nearest neighbour search: pure-NumPy IVF-Flat index over an EmbeddingIndex."""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .embeddings import EmbeddingIndex, _top_rows, _unit
+
+IVF_FORMAT_VERSION = 1
+_ASSIGN_BLOCK = 65536  # rows scored against centroids per step while assigning
+
+
+def default_nlist(n_rows: int) -> int:
+    """Rule of thumb: ~4 * sqrt(N) inverted lists."""
+    return max(1, int(4 * np.sqrt(max(n_rows, 1))))
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by cosine) for every row, computed in blocks."""
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), _ASSIGN_BLOCK):
+        block = np.asarray(matrix[start : start + _ASSIGN_BLOCK], dtype=np.float32)
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, iters: int, seed: int) -> np.ndarray:
+    """k-means on unit vectors (cosine): centroids are renormalized cluster means."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        # Re-seed empty lists from random points so every list stays useful
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-9)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    IVF-Flat: rows are bucketed by nearest centroid; a query scores the centroids,
+    then only the rows in the `nprobe` closest buckets. nprobe trades recall for latency
+    (nprobe == nlist is exact search).
+    """
+
+    def __init__(
+        self,
+        base: EmbeddingIndex,
+        centroids: np.ndarray,
+        list_rows: np.ndarray,
+        list_offsets: np.ndarray,
+        nprobe: int = 8,
+    ):
+        self.base = base
+        self.ids = base.ids
+        self.mask_for = base.mask_for
+        self.centroids = centroids
+        self.list_rows = list_rows  # row ids grouped by list (CSR layout)
+        self.list_offsets = list_offsets  # list i = list_rows[offsets[i]:offsets[i + 1]]
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    @classmethod
+    def build(
+        cls,
+        base: EmbeddingIndex,
+        nlist: int | None = None,
+        nprobe: int = 8,
+        iters: int = 10,
+        max_train: int = 256,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Train centroids on a sample (max_train points per list) and bucket every row."""
+        n = len(base)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over an empty embedding index.")
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+        train_rows = np.sort(rng.choice(n, size=min(n, nlist * max_train), replace=False))
+        sample = np.asarray(base.matrix[train_rows], dtype=np.float32)
+        centroids = _spherical_kmeans(sample, nlist, iters, seed)
+
+        labels = _assign(base.matrix, centroids)
+        list_rows = np.argsort(labels, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=nlist), out=list_offsets[1:])
+        return cls(base, centroids, list_rows, list_offsets, nprobe=nprobe)
+
+    def search(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+        nprobe: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k: (rows, scores), best first. May return fewer than k rows.
+        With a row mask, candidates from the probed lists are filtered before scoring."""
+        q = _unit(query_emb)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        lists = _top_rows(self.centroids @ q, nprobe)
+        candidates = np.concatenate(
+            [self.list_rows[self.list_offsets[i] : self.list_offsets[i + 1]] for i in lists]
+        )
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        candidates.sort()  # sequential reads from a memmapped matrix
+        scores = np.asarray(self.base.matrix[candidates], dtype=np.float32) @ q
+        top = _top_rows(scores, k)
+        return candidates[top], scores[top]
+
+    def save(self, path: Path, base_checksum: str = "") -> None:
+        """Write centroids and lists to an .npz (atomically); base_checksum ties it to a store."""
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            centroids=self.centroids,
+            list_rows=self.list_rows,
+            list_offsets=self.list_offsets,
+            meta=np.array(
+                json.dumps(
+                    {
+                        "format_version": IVF_FORMAT_VERSION,
+                        "count": len(self.base),
+                        "nprobe": self.nprobe,
+                        "base_sha256": base_checksum,
+                    }
+                )
+            ),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        base: EmbeddingIndex,
+        base_checksum: str = "",
+        nprobe: int | None = None,
+    ) -> "IVFIndex":
+        """Load a saved index; raises ValueError if it was built for different embeddings."""
+        with np.load(path) as data:
+            meta: dict[str, Any] = json.loads(str(data["meta"]))
+            if meta.get("format_version") != IVF_FORMAT_VERSION:
+                raise ValueError(f"Unsupported IVF index version: {meta.get('format_version')}")
+            if meta.get("count") != len(base) or meta.get("base_sha256", "") != base_checksum:
+                raise ValueError(f"IVF index {path} is stale for the current embeddings.")
+            return cls(
+                base,
+                data["centroids"],
+                data["list_rows"],
+                data["list_offsets"],
+                nprobe=nprobe or int(meta.get("nprobe", 8)),
+            )
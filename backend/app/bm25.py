@@ -0,0 +1,115 @@
+"""In-memory BM25 inverted index over catalog searchable text, plus reciprocal-rank fusion."""
+
+import re
+from typing import Any
+
+import numpy as np
+
+from .catalog import get_searchable_text
+
+# Query filler that carries no product signal
+STOPWORDS = frozenset(
+    """a an and are any best buy can do find for from good i in is it looking me my need of on
+    or please recommend show some suggest that the to want what which with you""".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens; keeps model numbers like 'h2' or '4' intact."""
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest positive scores, best first."""
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    nz = np.flatnonzero(scores > 0)
+    if len(nz) > k:
+        nz = nz[np.argpartition(-scores[nz], k - 1)[:k]]
+    return nz[np.argsort(-scores[nz], kind="stable")]
+
+
+class BM25Index:
+    """Okapi BM25 over one document per catalog product; row i is catalog[i]."""
+
+    def __init__(self, products: list[dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.products = products
+        self.ids = [p.get("id", "") for p in products]
+        self.k1 = k1
+        self.b = b
+
+        postings: dict[str, dict[int, int]] = {}
+        doc_len = np.zeros(len(products), dtype=np.float32)
+        for row, product in enumerate(products):
+            # The id is indexed too, so ASIN lookups hit exactly
+            tokens = tokenize(f"{product.get('id', '')} {get_searchable_text(product)}")
+            doc_len[row] = len(tokens)
+            for tok in tokens:
+                counts = postings.setdefault(tok, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        n = len(products)
+        avg_len = float(doc_len.mean()) if n else 0.0
+        # Length normalization is per document, so fold it in once at build time
+        self._norm = k1 * (1 - b + b * doc_len / (avg_len or 1.0))
+        self.idf: dict[str, float] = {}
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for tok, counts in postings.items():
+            df = len(counts)
+            self.idf[tok] = float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+            self.postings[tok] = (
+                np.fromiter(counts.keys(), dtype=np.int64, count=df),
+                np.fromiter(counts.values(), dtype=np.float32, count=df),
+            )
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.products), dtype=np.float32)
+        for tok in set(tokenize(query)):
+            if tok not in self.postings:
+                continue
+            rows, tf = self.postings[tok]
+            scores[rows] += self.idf[tok] * tf * (self.k1 + 1) / (tf + self._norm[rows])
+        return scores
+
+    def search(self, query: str, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k rows with a positive score: (rows, scores), best first. mask restricts rows."""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        rows = _top_rows(scores, k)
+        return rows, scores[rows]
+
+    def is_confident(
+        self,
+        query: str,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        min_coverage: float = 1.0,
+        min_margin: float = 1.5,
+    ) -> bool:
+        """
+        True when the lexical top hit is decisive: it contains (idf-weighted) `min_coverage`
+        of the query terms and beats the runner-up by `min_margin`x. Queries with unknown
+        terms never qualify, so semantic phrasing still goes to the vector search.
+        """
+        terms = set(tokenize(query))
+        if len(rows) == 0 or not terms or any(t not in self.idf for t in terms):
+            return False
+        top = int(rows[0])
+        total = sum(self.idf[t] for t in terms)
+        matched = sum(self.idf[t] for t in terms if top in self.postings[t][0])
+        if total <= 0 or matched / total < min_coverage:
+            return False
+        return len(scores) < 2 or scores[0] >= min_margin * scores[1]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Fuse ranked id lists: score(id) = sum 1 / (k + rank). Ties keep first-seen order."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, start=1):
+            fused[pid] = fused.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda pid: fused[pid], reverse=True)
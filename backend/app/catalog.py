@@ -5,6 +5,8 @@ import re
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 CATALOG_CSVS = [
     DATA_DIR / "amazon_100_products.csv",
@@ -20,6 +22,14 @@ def _parse_rating(rating_str: str) -> float | None:
     return float(match.group(1)) if match else None
 
 
+def _parse_price(price_str: str) -> float | None:
+    """Extract numeric price from '$1,299.99' or similar."""
+    if not price_str:
+        return None
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", price_str)
+    return float(match.group(0).replace(",", "")) if match else None
+
+
 def _parse_review_count(count_str: str) -> int | None:
     """Extract count from '(14,356)' or similar."""
     if not count_str:
@@ -56,6 +66,7 @@ def _load_from_csv(path: Path) -> list[dict[str, Any]]:
                 "name": name,
                 "price": price_str or "—",
                 "price_raw": price_str,
+                "price_value": _parse_price(price_str),
                 "image_url": image_url,
                 "description": description or name,
                 "rating": rating,
@@ -68,7 +79,12 @@ def _load_from_csv(path: Path) -> list[dict[str, Any]]:
     return products
 
 
-def load_catalog() -> list[dict[str, Any]]:
+def normalize_name(name: str) -> str:
+    """Lookup key for product names: lowercase, punctuation stripped, whitespace collapsed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+
+def load_catalog(version: str = "") -> "Catalog":
     """Load product catalog from all CSV files (amazon_100 + amazon_clothing)."""
     seen_ids: set[str] = set()
     products: list[dict[str, Any]] = []
@@ -83,11 +99,13 @@ def load_catalog() -> list[dict[str, Any]]:
                     products.append(p)
         except Exception:
             continue
-    return products
+    return Catalog(products, version=version)
 
 
 def get_product_by_id(product_id: str, catalog: list[dict[str, Any]]) -> dict[str, Any] | None:
-    """Get a product by ID from the catalog."""
+    """Get a product by ID from the catalog (O(1) for a Catalog, linear scan for a plain list)."""
+    if isinstance(catalog, Catalog):
+        return catalog.get(product_id)
     for p in catalog:
         if p.get("id") == product_id:
             return p
@@ -103,3 +121,82 @@ def get_searchable_text(product: dict[str, Any]) -> str:
         product.get("category", ""),
     ]
     return " ".join(str(p) for p in parts if p)
+
+
+class CatalogColumns:
+    """Columnar views of a catalog for vectorized filtering; row i is catalog[i]."""
+
+    def __init__(self, catalog: list[dict[str, Any]]):
+        self.ids = [p.get("id", "") for p in catalog]
+        self.price = np.array(
+            [p["price_value"] if p.get("price_value") is not None else np.nan for p in catalog],
+            dtype=np.float32,
+        )
+        self.rating = np.array(
+            [p["rating"] if p.get("rating") is not None else np.nan for p in catalog],
+            dtype=np.float32,
+        )
+        # Lowercased category -> bitmap of rows in that category
+        self.categories: dict[str, np.ndarray] = {}
+        for row, p in enumerate(catalog):
+            cat = (p.get("category") or "").strip().lower()
+            if cat:
+                if cat not in self.categories:
+                    self.categories[cat] = np.zeros(len(catalog), dtype=bool)
+                self.categories[cat][row] = True
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class Catalog(list):
+    """
+    The product list plus hash indexes: id -> row, category -> rows, normalized name -> rows,
+    and CatalogColumns for filtering. Still a list, so code that iterates or serializes the
+    catalog is unchanged. Treat it as immutable: indexes are built once in __init__.
+
+    A Catalog is also a snapshot: `version` identifies it and `derived` holds search
+    structures built for it (embedding searchers, BM25), so requests holding an old
+    Catalog keep using that snapshot's indexes after a reload swaps in a new one.
+    """
+
+    def __init__(self, products: list[dict[str, Any]] = (), version: str = ""):
+        super().__init__(products)
+        self.version = version
+        self.derived: dict[str, Any] = {}
+        self.row_of: dict[str, int] = {}
+        self._by_category: dict[str, list[int]] = {}
+        self._by_name: dict[str, list[int]] = {}
+        for row, p in enumerate(self):
+            self.row_of.setdefault(p.get("id", ""), row)
+            cat = (p.get("category") or "").strip().lower()
+            if cat:
+                self._by_category.setdefault(cat, []).append(row)
+            self._by_name.setdefault(normalize_name(p.get("name", "")), []).append(row)
+        self.columns = CatalogColumns(self)
+
+    def get(self, product_id: str) -> dict[str, Any] | None:
+        row = self.row_of.get(product_id)
+        return self[row] if row is not None else None
+
+    def by_category(self, category: str) -> list[dict[str, Any]]:
+        return [self[r] for r in self._by_category.get(category.strip().lower(), [])]
+
+    def by_name(self, name: str) -> list[dict[str, Any]]:
+        return [self[r] for r in self._by_name.get(normalize_name(name), [])]
+
+    def categories(self) -> list[str]:
+        return list(self._by_category)
+
+
+_columns_cache: tuple[list[dict[str, Any]], CatalogColumns] | None = None
+
+
+def get_columns(catalog: list[dict[str, Any]]) -> CatalogColumns:
+    """Columns for a catalog: prebuilt on a Catalog, built once per plain list otherwise."""
+    global _columns_cache
+    if isinstance(catalog, Catalog):
+        return catalog.columns
+    if _columns_cache is None or _columns_cache[0] is not catalog:
+        _columns_cache = (catalog, CatalogColumns(catalog))
+    return _columns_cache[1]
@@ -0,0 +1,232 @@
+"""Compact on-disk embedding store: JSON header naming a .npy matrix + id sidecar, opened via memmap."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DEFAULT_STORE_PATH = Path(__file__).parent.parent / "data" / "product_embeddings.npy"
+LOCAL_STORE_PATH = DEFAULT_STORE_PATH.with_name("product_embeddings_local.npy")
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def ids_path(store_path: Path) -> Path:
+    """Sidecar holding row -> product id (JSON list)."""
+    return store_path.with_suffix(".ids.json")
+
+
+def hashes_path(store_path: Path) -> Path:
+    """Optional sidecar: per-row content hash of the text each embedding was built from."""
+    return store_path.with_suffix(".hashes.json")
+
+
+def meta_path(store_path: Path) -> Path:
+    """Header holding model name, dimension, dtype, row count and checksum."""
+    return store_path.with_suffix(".meta.json")
+
+
+def _versioned(path: Path, version: str) -> Path:
+    """product_embeddings.ids.json -> product_embeddings.<version>.ids.json"""
+    stem, _, suffixes = path.name.partition(".")
+    return path.with_name(f"{stem}.{version}.{suffixes}")
+
+
+def _read_meta(store_path: Path) -> dict[str, Any] | None:
+    try:
+        with open(meta_path(store_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def store_files(store_path: Path, meta: dict[str, Any]) -> tuple[Path, Path, Path | None]:
+    """
+    (matrix, ids, hashes) files a header points at. Headers written by write_store name
+    versioned files; older headers imply the fixed sidecar names next to store_path.
+    """
+    files = meta.get("files")
+    if not files:
+        return store_path, ids_path(store_path), hashes_path(store_path)
+    hashes = files.get("hashes")
+    return (
+        store_path.with_name(files["matrix"]),
+        store_path.with_name(files["ids"]),
+        store_path.with_name(hashes) if hashes else None,
+    )
+
+
+def store_exists(store_path: Path = DEFAULT_STORE_PATH) -> bool:
+    meta = _read_meta(store_path)
+    if meta is None:
+        return False
+    matrix, ids, _ = store_files(store_path, meta)
+    return matrix.exists() and ids.exists()
+
+
+def file_checksum(path: Path, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file, read in chunks so large matrices never load fully."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(text: str) -> str:
+    """Hash of the text an embedding was computed from (for incremental precompute)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _tmp(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _write_json(path: Path, data: Any) -> str:
+    """Write JSON and return its sha256."""
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return file_checksum(path)
+
+
+class EmbeddingStore:
+    """An opened store. `matrix` is a read-only memmap of L2-normalized rows."""
+
+    def __init__(
+        self,
+        path: Path,
+        ids: list[str],
+        matrix: np.ndarray,
+        meta: dict[str, Any],
+        hashes: list[str] | None = None,
+    ):
+        self.path = path
+        self.ids = ids
+        self.matrix = matrix
+        self.meta = meta
+        self.hashes = hashes
+
+    @property
+    def model(self) -> str:
+        return self.meta.get("model", "")
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta.get("dim", 0))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def verify(self) -> bool:
+        """Recompute the matrix checksum and compare with the header."""
+        return file_checksum(self.path) == self.meta.get("sha256")
+
+
+def write_store(
+    ids: list[str],
+    matrix: np.ndarray,
+    model: str,
+    store_path: Path = DEFAULT_STORE_PATH,
+    dtype: str = "float32",
+    extra_meta: dict[str, Any] | None = None,
+    hashes: list[str] | None = None,
+) -> dict[str, Any]:
+    """
+    Write embeddings as an L2-normalized matrix (plus optional per-row content hashes).
+    The matrix, ids and hashes go to new files named after the matrix checksum, and the
+    header naming them is renamed into place last: that rename is the single switch, so a
+    reader sees either the old store or the new one, never a mix. Files of the previous
+    store are removed afterwards (a reader still holding the old header then gets
+    FileNotFoundError, not mismatched rows). Returns the header.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; use one of {SUPPORTED_DTYPES}.")
+    mat = np.asarray(matrix, dtype=np.float32)
+    if mat.ndim != 2 or len(mat) != len(ids):
+        raise ValueError(f"Expected a ({len(ids)}, dim) matrix, got shape {mat.shape}.")
+    if hashes is not None and len(hashes) != len(ids):
+        raise ValueError(f"Got {len(hashes)} content hashes for {len(ids)} ids.")
+    mat = mat / (np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9)
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    previous = _read_meta(store_path)
+    staged = _tmp(store_path)
+    with open(staged, "wb") as f:
+        np.save(f, mat.astype(dtype))
+    checksum = file_checksum(staged)
+    version = checksum[:16]
+    files = {"matrix": _versioned(store_path, version), "ids": _versioned(ids_path(store_path), version)}
+    if hashes is not None:
+        files["hashes"] = _versioned(hashes_path(store_path), version)
+
+    os.replace(staged, files["matrix"])
+    ids_checksum = _write_json(_tmp(files["ids"]), list(ids))
+    os.replace(_tmp(files["ids"]), files["ids"])
+    if hashes is not None:
+        _write_json(_tmp(files["hashes"]), list(hashes))
+        os.replace(_tmp(files["hashes"]), files["hashes"])
+
+    meta = {
+        **(extra_meta or {}),
+        "format_version": FORMAT_VERSION,
+        "model": model,
+        "dim": int(mat.shape[1]),
+        "count": len(ids),
+        "dtype": dtype,
+        "normalized": True,
+        "sha256": checksum,
+        "ids_sha256": ids_checksum,
+        "files": {kind: path.name for kind, path in files.items()},
+    }
+    _write_json(_tmp(meta_path(store_path)), meta)
+    os.replace(_tmp(meta_path(store_path)), meta_path(store_path))
+
+    if previous is not None:
+        for old in store_files(store_path, previous):
+            if old is not None and old not in files.values():
+                old.unlink(missing_ok=True)
+    return meta
+
+
+def open_store(store_path: Path = DEFAULT_STORE_PATH, verify: bool = False) -> EmbeddingStore:
+    """Open a store with np.memmap (via np.load mmap_mode) and sanity-check it against its header."""
+    if not store_exists(store_path):
+        raise FileNotFoundError(
+            f"Embedding store not found at {store_path}. "
+            "Run precompute_embeddings.py or convert_embeddings.py first."
+        )
+    with open(meta_path(store_path)) as f:
+        meta = json.load(f)
+    matrix_file, ids_file, hashes_file = store_files(store_path, meta)
+    with open(ids_file, "rb") as f:
+        raw_ids = f.read()
+    if meta.get("ids_sha256") and hashlib.sha256(raw_ids).hexdigest() != meta["ids_sha256"]:
+        raise ValueError(f"Embedding store {store_path} id list does not match its header.")
+    ids = json.loads(raw_ids)
+
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding store version: {meta.get('format_version')}")
+    matrix = np.load(matrix_file, mmap_mode="r")
+    expected = (int(meta["count"]), int(meta["dim"]))
+    if matrix.shape != expected or len(ids) != expected[0]:
+        raise ValueError(
+            f"Embedding store {store_path} is inconsistent: matrix {matrix.shape}, "
+            f"{len(ids)} ids, header {expected}."
+        )
+    if str(matrix.dtype) != meta.get("dtype"):
+        raise ValueError(f"Embedding store dtype {matrix.dtype} does not match header {meta.get('dtype')}.")
+
+    hashes = None
+    if hashes_file is not None and hashes_file.exists():
+        with open(hashes_file) as f:
+            hashes = json.load(f)
+        if len(hashes) != len(ids):
+            hashes = None  # stale sidecar: treat every row as unknown
+
+    store = EmbeddingStore(matrix_file, ids, matrix, meta, hashes)
+    if verify and not store.verify():
+        raise ValueError(f"Checksum mismatch for embedding store {store_path}.")
+    return store
@@ -1,18 +1,303 @@
 """Embeddings for semantic product search using OpenAI API."""
 
+import asyncio
 import json
 import os
+import re
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 
+from .catalog import Catalog
+from .embedding_store import (
+    DEFAULT_STORE_PATH,
+    LOCAL_STORE_PATH,
+    EmbeddingStore,
+    open_store,
+    store_exists,
+)
+from .local_embeddings import (
+    LOCAL_EMBED_DIM,
+    LOCAL_EMBED_MODEL,
+    LocalEmbedder,
+    compute_local_embedding,
+    get_local_embedder,
+    load_local_embedder,
+)
+
 EMBED_MODEL = "text-embedding-3-small"
+EMBED_DIM = 1536
 RELEVANCE_THRESHOLD = 0.35
+LOCAL_RELEVANCE_THRESHOLD = 0.15  # hashed n-gram cosines run lower than OpenAI's
+# openai: text-embedding-3-small via API. local: offline hashed n-grams (app/local_embeddings.py).
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "openai").strip().lower()
+# When OpenAI fails, retrieval retries the query on the local index if one was built
+EMBED_FALLBACK_LOCAL = os.getenv("EMBED_FALLBACK_LOCAL", "1") != "0"
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "16"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))
+# Concurrent queries arriving within this window are sent as one batched request (0 disables)
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+# Inputs per embeddings request for explicit batch calls (API allows up to 2048)
+EMBED_REQUEST_MAX_INPUTS = int(os.getenv("EMBED_REQUEST_MAX_INPUTS", "256"))
+_SCORE_BLOCK = 16_000_000  # max query x row scores materialized at once by search_batch
+_UPCAST_ROWS = 16384  # rows of a float16 matrix upcast to float32 at once when scoring
 
 _EMBEDDINGS_PATH = Path(__file__).parent.parent / "data" / "product_embeddings.json"
+_STORE_PATH = DEFAULT_STORE_PATH
+_STORE_PATHS = {"openai": DEFAULT_STORE_PATH, "local": LOCAL_STORE_PATH}
+# (model, dim) a store must have been built with to be searched with a provider's query vectors
+_STORE_MODELS = {"openai": (EMBED_MODEL, EMBED_DIM), "local": (LOCAL_EMBED_MODEL, LOCAL_EMBED_DIM)}
 
 _product_embeddings_cache: dict[str, list[float]] | None = None
+_index_cache: dict[str, "EmbeddingIndex"] = {}
+
+# Long-lived async client + concurrency limit, owned by the FastAPI lifespan
+_async_client: Any = None
+_embed_semaphore: asyncio.Semaphore | None = None
+_batcher: "EmbeddingBatcher | None" = None
+
+
+def normalize_query(text: str) -> str:
+    """Canonical cache key: lowercase, punctuation stripped, whitespace collapsed."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings with a per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_size: int = EMBED_CACHE_SIZE, ttl: float = EMBED_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+
+    def get(self, query: str) -> list[float] | None:
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, query: str, embedding: list[float]) -> None:
+        if self.max_size <= 0:
+            return
+        key = normalize_query(query)
+        self._entries[key] = (time.monotonic() + self.ttl, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_query_cache = QueryEmbeddingCache()
+
+
+def query_cache_stats() -> dict[str, Any]:
+    """Hit/miss counters for the query-embedding cache."""
+    return _query_cache.stats()
+
+
+class EmbeddingIndex:
+    """
+    Product index: contiguous, L2-normalized matrix + row -> product id map.
+    Pass normalized=True for rows that are already unit length (e.g. a memmapped store)
+    to use the matrix as-is instead of copying it into RAM.
+    """
+
+    def __init__(self, ids: list[str], matrix: np.ndarray, normalized: bool = False):
+        if len(ids) != len(matrix):
+            raise ValueError(f"Got {len(ids)} ids for {len(matrix)} embedding rows.")
+        self.ids = list(ids)
+        self.row_of = {pid: i for i, pid in enumerate(self.ids)}
+        self.checksum = ""  # sha256 of the backing store, when loaded from one
+        if normalized:
+            self.matrix = matrix
+        else:
+            mat = np.ascontiguousarray(matrix, dtype=np.float32)
+            norms = np.linalg.norm(mat, axis=1, keepdims=True)
+            self.matrix = mat / (norms + 1e-9)
+
+    @classmethod
+    def from_dict(cls, embeddings: dict[str, list[float]]) -> "EmbeddingIndex":
+        """Build from a {product_id: embedding} mapping."""
+        ids = list(embeddings)
+        matrix = np.array([embeddings[pid] for pid in ids], dtype=np.float32)
+        return cls(ids, matrix.reshape(len(ids), -1))
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore) -> "EmbeddingIndex":
+        """Wrap a memmapped store without loading it (rows are stored normalized)."""
+        index = cls(store.ids, store.matrix, normalized=True)
+        index.checksum = store.meta.get("sha256", "")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def scores(self, query_emb: list[float] | np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every row (one matrix-vector product)."""
+        return _matmul(self.matrix, _unit(query_emb))
+
+    def search(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Exact top-k: (rows, scores), best first. With a row mask only passing rows are scored."""
+        if mask is None:
+            scores = self.scores(query_emb)
+            rows = _top_rows(scores, k)
+            return rows, scores[rows]
+        allowed = np.flatnonzero(mask)
+        scores = _matmul(self.matrix[allowed], _unit(query_emb))
+        top = _top_rows(scores, k)
+        return allowed[top], scores[top]
+
+    def mask_for(self, product_ids: list[str]) -> np.ndarray:
+        """Row bitmap for a set of product ids (ids without an embedding are ignored)."""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        rows = [self.row_of[pid] for pid in product_ids if pid in self.row_of]
+        mask[rows] = True
+        return mask
+
+    def search_batch(self, query_embs: np.ndarray, k: int) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Exact top-k for many queries: one matrix-matrix product per block of queries."""
+        q = np.asarray(query_embs, dtype=np.float32)
+        q = q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-9)
+        n = len(self.ids)
+        k = min(k, n)
+        out: list[tuple[np.ndarray, np.ndarray]] = []
+        step = max(1, _SCORE_BLOCK // max(n, 1))
+        for start in range(0, len(q), step):
+            scores = _matmul(self.matrix, q[start : start + step].T).T
+            if k <= 0:
+                out.extend((np.empty(0, np.intp), np.empty(0, np.float32)) for _ in scores)
+                continue
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(scores), 1))
+            top = np.take_along_axis(scores, rows, axis=1)
+            order = np.argsort(-top, axis=1, kind="stable")
+            rows = np.take_along_axis(rows, order, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            out.extend(zip(rows, top))
+        return out
+
+    def top_k(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        min_score: float = -1.0,
+    ) -> list[tuple[str, float]]:
+        """Return up to k (product_id, score) pairs with score >= min_score, best first."""
+        rows, scores = self.search(query_emb, k)
+        return [(self.ids[r], float(s)) for r, s in zip(rows, scores) if s >= min_score]
+
+
+def _matmul(matrix: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    matrix @ q in float32. A float16 (memmapped) matrix is upcast _UPCAST_ROWS rows at a
+    time rather than whole, which numpy would otherwise do on every query.
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ q
+    out = np.empty((len(matrix),) + q.shape[1:], dtype=np.float32)
+    for start in range(0, len(matrix), _UPCAST_ROWS):
+        out[start : start + _UPCAST_ROWS] = np.asarray(matrix[start : start + _UPCAST_ROWS], dtype=np.float32) @ q
+    return out
+
+
+def _unit(vec: list[float] | np.ndarray) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    return v / (np.linalg.norm(v) + 1e-9)
+
+
+class MatryoshkaIndex:
+    """
+    Coarse-to-fine search for Matryoshka embeddings (text-embedding-3-*): the first `dims`
+    components, renormalized, are a usable embedding on their own. Stage one scans a small
+    contiguous (N, dims) matrix; stage two rescores the best `candidates` rows at full width.
+    """
+
+    def __init__(self, base: EmbeddingIndex, dims: int = 256, candidates: int = 200):
+        self.base = base
+        self.ids = base.ids
+        self.mask_for = base.mask_for
+        self.dims = min(dims, base.dim)
+        self.candidates = candidates
+        prefix = np.empty((len(base), self.dims), dtype=np.float32)
+        for start in range(0, len(base), 65536):
+            block = np.asarray(base.matrix[start : start + 65536, : self.dims], dtype=np.float32)
+            prefix[start : start + len(block)] = block / (
+                np.linalg.norm(block, axis=1, keepdims=True) + 1e-9
+            )
+        self.prefix = prefix
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def search(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Prefix scan for max(k, candidates) rows, full-dimension rerank, top-k (rows, scores)."""
+        q = _unit(query_emb)
+        coarse = self.prefix @ _unit(q[: self.dims])
+        if mask is not None:
+            coarse[~mask] = -np.inf
+        rows = np.sort(_top_rows(coarse, max(k, self.candidates)))
+        if mask is not None:
+            rows = rows[mask[rows]]
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        scores = np.asarray(self.base.matrix[rows], dtype=np.float32) @ q
+        top = _top_rows(scores, k)
+        return rows[top], scores[top]
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, sorted descending (argpartition + sort of k)."""
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(n)
+    return rows[np.argsort(-scores[rows], kind="stable")]
 
 
 def _load_precomputed() -> dict[str, list[float]]:
@@ -20,7 +305,7 @@ def _load_precomputed() -> dict[str, list[float]]:
     if _product_embeddings_cache is None:
         if not _EMBEDDINGS_PATH.exists():
             raise FileNotFoundError(
-                f"product_embeddings.json not found at {_EMBEDDINGS_PATH}. "
+                f"No embeddings found at {_STORE_PATH} or {_EMBEDDINGS_PATH}. "
                 "Run precompute_embeddings.py first."
             )
         with open(_EMBEDDINGS_PATH) as f:
@@ -28,8 +313,75 @@ def _load_precomputed() -> dict[str, list[float]]:
     return _product_embeddings_cache
 
 
-def compute_embedding(text: str) -> list[float]:
-    """Embed a query string via OpenAI API at runtime."""
+def store_path_for(provider: str) -> Path:
+    """Product embedding store matching a query embedding provider."""
+    if provider not in _STORE_PATHS:
+        raise ValueError(f"Unknown EMBED_PROVIDER {provider!r}; use 'openai' or 'local'.")
+    return _STORE_PATHS[provider]
+
+
+def relevance_threshold(provider: str | None = None) -> float:
+    """Minimum cosine score for a product to count as a match under a provider."""
+    return LOCAL_RELEVANCE_THRESHOLD if (provider or EMBED_PROVIDER) == "local" else RELEVANCE_THRESHOLD
+
+
+def local_index_available() -> bool:
+    return store_exists(LOCAL_STORE_PATH)
+
+
+def load_index(provider: str | None = None) -> EmbeddingIndex:
+    """
+    Load pre-computed embeddings for a provider from disk (uncached).
+    Prefers the binary memmapped store; the OpenAI index falls back to legacy product_embeddings.json.
+    """
+    global _product_embeddings_cache
+    provider = provider or EMBED_PROVIDER
+    store_path = store_path_for(provider)
+    if store_exists(store_path) or provider != "openai":
+        store = open_store(store_path)
+        model, dim = _STORE_MODELS[provider]
+        if (store.model, store.dim) != (model, dim):
+            raise ValueError(
+                f"Embedding store {store_path} holds {store.model!r} ({store.dim}-d) vectors; "
+                f"{provider} queries need {model!r} ({dim}-d). Re-run precompute_embeddings.py."
+            )
+        return EmbeddingIndex.from_store(store)
+    index = EmbeddingIndex.from_dict(_load_precomputed())
+    # The matrix holds everything we need; drop the boxed-float lists.
+    _product_embeddings_cache = None
+    return index
+
+
+def local_embedder_for(catalog: list[dict[str, Any]] | None = None) -> LocalEmbedder:
+    """
+    Local query embedder matching a snapshot's local store: loaded once per Catalog
+    snapshot (its IDF is refit whenever the store is rebuilt), else process-wide.
+    """
+    if not isinstance(catalog, Catalog):
+        return get_local_embedder()
+    if "local_embedder" not in catalog.derived:
+        catalog.derived["local_embedder"] = load_local_embedder()
+    return catalog.derived["local_embedder"]
+
+
+def get_index(provider: str | None = None) -> EmbeddingIndex:
+    """Process-wide EmbeddingIndex for a provider, loaded once."""
+    provider = provider or EMBED_PROVIDER
+    if provider not in _index_cache:
+        _index_cache[provider] = load_index(provider)
+    return _index_cache[provider]
+
+
+def compute_embedding(
+    text: str, provider: str | None = None, catalog: list[dict[str, Any]] | None = None
+) -> list[float]:
+    """Embed a query string via OpenAI API at runtime (cached by normalized query)."""
+    if (provider or EMBED_PROVIDER) == "local":
+        return compute_local_embedding(text, local_embedder_for(catalog))
+    cached = _query_cache.get(text)
+    if cached is not None:
+        return cached
+
     from openai import OpenAI
 
     api_key = os.getenv("OPENAI_API_KEY")
@@ -38,7 +390,156 @@ def compute_embedding(text: str) -> list[float]:
 
     client = OpenAI(api_key=api_key)
     response = client.embeddings.create(model=EMBED_MODEL, input=text)
-    return response.data[0].embedding
+    embedding = response.data[0].embedding
+    _query_cache.put(text, embedding)
+    return embedding
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching coalescer: queues texts for up to `window` seconds (or `max_items`),
+    sends them in one embeddings request and resolves each caller's future.
+    Identical texts in the same batch share one input.
+    """
+
+    def __init__(self, send: Any, window: float, max_items: int):
+        self._send = send
+        self.window = window
+        self.max_items = max(1, max_items)
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        # In-flight sends; the loop only keeps weak references to tasks
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.setdefault(text, []).append(fut)
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        texts = list(batch)
+        self.batches += 1
+        self.items += len(texts)
+        try:
+            embeddings = await self._send(texts)
+        except Exception as e:
+            for futs in batch.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+        for text, emb in zip(texts, embeddings):
+            for fut in batch[text]:
+                if not fut.done():
+                    fut.set_result(emb)
+
+
+async def _embed_batch_async(texts: list[str]) -> list[list[float]]:
+    """One embeddings request for many inputs, results in input order."""
+    if _async_client is None or _embed_semaphore is None:
+        raise RuntimeError("OPENAI_API_KEY environment variable is not set.")
+    async with _embed_semaphore:
+        response = await _async_client.embeddings.create(model=EMBED_MODEL, input=texts)
+    return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
+
+
+def init_async_client() -> None:
+    """Create the pooled AsyncOpenAI client. No-op without OPENAI_API_KEY (chat still works)."""
+    global _async_client, _embed_semaphore, _batcher
+    if _async_client is not None:
+        return
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return
+
+    import httpx
+    from openai import AsyncOpenAI
+
+    _async_client = AsyncOpenAI(
+        api_key=api_key,
+        timeout=EMBED_TIMEOUT,
+        http_client=httpx.AsyncClient(
+            timeout=EMBED_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=EMBED_MAX_CONCURRENCY,
+                max_keepalive_connections=EMBED_MAX_CONCURRENCY,
+            ),
+        ),
+    )
+    _embed_semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+    if EMBED_BATCH_WINDOW_MS > 0:
+        _batcher = EmbeddingBatcher(_embed_batch_async, EMBED_BATCH_WINDOW_MS / 1000, EMBED_BATCH_MAX)
+
+
+async def close_async_client() -> None:
+    """Close the pooled client (FastAPI shutdown)."""
+    global _async_client, _embed_semaphore, _batcher
+    if _async_client is not None:
+        await _async_client.close()
+    _async_client = None
+    _embed_semaphore = None
+    _batcher = None
+
+
+async def compute_embedding_async(
+    text: str, provider: str | None = None, catalog: list[dict[str, Any]] | None = None
+) -> list[float]:
+    """Embed a query string without blocking the event loop, reusing pooled connections."""
+    if (provider or EMBED_PROVIDER) == "local":
+        return compute_local_embedding(text, local_embedder_for(catalog))
+    cached = _query_cache.get(text)
+    if cached is not None:
+        return cached
+    if _async_client is None:
+        init_async_client()
+    if _batcher is not None:
+        embedding = await _batcher.submit(text)
+    else:
+        embedding = (await _embed_batch_async([text]))[0]
+    _query_cache.put(text, embedding)
+    return embedding
+
+
+async def compute_embeddings_async(
+    texts: list[str], provider: str | None = None, catalog: list[dict[str, Any]] | None = None
+) -> list[list[float]]:
+    """Embed many texts: cache hits are reused, the rest go out in EMBED_REQUEST_MAX_INPUTS chunks."""
+    if (provider or EMBED_PROVIDER) == "local":
+        embedder = local_embedder_for(catalog)
+        return [compute_local_embedding(t, embedder) for t in texts]
+    if _async_client is None:
+        init_async_client()
+
+    results: list[list[float] | None] = [_query_cache.get(t) for t in texts]
+    missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    chunks = [
+        missing[i : i + EMBED_REQUEST_MAX_INPUTS]
+        for i in range(0, len(missing), EMBED_REQUEST_MAX_INPUTS)
+    ]
+    fresh: dict[str, list[float]] = {}
+    for chunk, embeddings in zip(chunks, await asyncio.gather(*map(_embed_batch_async, chunks))):
+        for text, emb in zip(chunk, embeddings):
+            fresh[text] = emb
+            _query_cache.put(text, emb)
+    return [r if r is not None else fresh[t] for t, r in zip(texts, results)]
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
@@ -47,25 +548,54 @@ def cosine_similarity(a: list[float], b: list[float]) -> float:
     return float(np.dot(va, vb) / (np.linalg.norm(va) * np.linalg.norm(vb) + 1e-9))
 
 
-def search_products(
-    query: str,
+def _product_lookup(catalog: list[dict[str, Any]]) -> Any:
+    """id -> product (O(1) on a Catalog; builds a dict for plain lists)."""
+    if isinstance(catalog, Catalog):
+        return catalog.get
+    return {p.get("id", ""): p for p in catalog}.get
+
+
+def rank_products(
+    index: Any,
+    query_emb: list[float] | np.ndarray,
     catalog: list[dict[str, Any]],
     top_k: int = 5,
     min_score: float = RELEVANCE_THRESHOLD,
+    mask: np.ndarray | None = None,
 ) -> list[dict[str, Any]]:
-    """Semantic search: embed query via OpenAI, compare to pre-computed product embeddings."""
-    precomputed = _load_precomputed()
-    query_emb = compute_embedding(query)
-
-    scored: list[tuple[float, dict[str, Any]]] = []
-    for product in catalog:
-        pid = product.get("id", "")
-        emb = precomputed.get(pid)
-        if emb is None:
-            continue
-        score = cosine_similarity(query_emb, emb)
-        if score >= min_score:
-            scored.append((score, product))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [p for _, p in scored[:top_k]]
+    """
+    Map the best index rows back to catalog products.
+    `index` is any backend with `ids` and `search(query_emb, k, mask) -> (rows, scores)`
+    (EmbeddingIndex, ann.IVFIndex, quantized.Int8Index); `mask` restricts scoring to index rows.
+    """
+    lookup = _product_lookup(catalog)
+    k = top_k
+    while True:
+        rows, scores = index.search(query_emb, k, mask)
+        matches = (lookup(index.ids[r]) for r, score in zip(rows, scores) if score >= min_score)
+        results = [p for p in matches if p is not None]
+        # Rows missing from this catalog can push matches out of the first k; widen and retry.
+        if len(results) >= top_k or len(rows) < k or scores[-1] < min_score:
+            return results[:top_k]
+        k *= 2
+
+
+def rank_products_batch(
+    index: Any,
+    query_embs: list[list[float]] | np.ndarray,
+    catalog: list[dict[str, Any]],
+    top_k: int = 5,
+    min_score: float = RELEVANCE_THRESHOLD,
+) -> list[list[dict[str, Any]]]:
+    """rank_products for many queries; uses index.search_batch (one GEMM) when available."""
+    if not hasattr(index, "search_batch"):
+        return [rank_products(index, q, catalog, top_k, min_score) for q in query_embs]
+    lookup = _product_lookup(catalog)
+    out: list[list[dict[str, Any]]] = []
+    for q, (rows, scores) in zip(query_embs, index.search_batch(np.asarray(query_embs), top_k)):
+        matches = (lookup(index.ids[r]) for r, score in zip(rows, scores) if score >= min_score)
+        results = [p for p in matches if p is not None]
+        if len(results) < top_k and len(rows) == top_k and top_k and scores[-1] >= min_score:
+            results = rank_products(index, q, catalog, top_k, min_score)  # rows missing from catalog
+        out.append(results)
+    return out
@@ -0,0 +1,140 @@
+"""Structured search filters (category, price range, rating) and a query-text parser for them."""
+
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from .catalog import CatalogColumns
+
+_NUM = r"\$?\s*(\d[\d,]*(?:\.\d+)?)\s*(?:dollars|usd|bucks)?"
+_CURRENCY = re.compile(r"\$|\b(?:dollars|usd|bucks)\b", re.IGNORECASE)
+# A bare number followed by one of these is a spec ("at least 20000 mAh", "under 3 pounds"), not a price
+_UNIT = re.compile(
+    r"\s*(?:\d|[.,]\d|%|\"|'|x\b|(?:mah|wh|hours?|hrs?|h|minutes?|mins?|seconds?|secs?|days?|weeks?|"
+    r"months?|years?|yrs?|pounds?|lbs?|lb|oz|ounces?|kg|kilograms?|grams?|g|inch(?:es)?|in|ft|feet|"
+    r"foot|cm|mm|m|meters?|metres?|miles?|km|people|persons?|person|players?|seats?|gb|tb|mb|ghz|mhz|"
+    r"hz|watts?|w|volts?|v|amps?|mp|megapixels?|k|p|rpm|dpi|fps|ml|l|liters?|litres?|gallons?|qt|"
+    r"quarts?|cups?|pieces?|pcs|packs?|count|ct|sq|square|degrees?|mph|speeds?|ports?|slots?|"
+    r"layers?|ply|tier)\b)",
+    re.IGNORECASE,
+)
+
+_PRICE_BETWEEN = re.compile(rf"\bbetween\s+{_NUM}\s+(?:and|to|-)\s+{_NUM}", re.IGNORECASE)
+_PRICE_RANGE = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)\s*(?:-|to)\s*\$?\s*(\d[\d,]*(?:\.\d+)?)", re.IGNORECASE)
+_PRICE_MAX = re.compile(
+    rf"\b(?:under|below|less\s+than|cheaper\s+than|at\s+most|up\s+to|no\s+more\s+than)\s+{_NUM}",
+    re.IGNORECASE,
+)
+_PRICE_MIN = re.compile(
+    rf"\b(?:over|above|more\s+than|at\s+least|starting\s+at)\s+{_NUM}(?!\s*(?:\+|stars?|star\b))",
+    re.IGNORECASE,
+)
+_RATING_MIN = re.compile(
+    r"(?:\b(?:at\s+least|rated|minimum|min)\s+)?\b(\d(?:\.\d+)?)(?![\d]|[.,]\d)\s*(?:\+\s*|-)?\s*stars?"
+    r"(?:\s+(?:and\s+up|or\s+(?:more|higher|better|above)|\+))?",
+    re.IGNORECASE,
+)
+_RATING_ABOVE = re.compile(
+    r"\b(?:rated|rating)\s+(?:of\s+)?(?:at\s+least\s+|above\s+|over\s+)?\b(\d(?:\.\d+)?)(?![\d]|[.,]\d)"
+    r"\s*(?:\+|and\s+up|or\s+(?:more|higher|better|above))?",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SearchFilters:
+    """Hard constraints applied before scoring. None means unconstrained."""
+
+    category: str | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    min_rating: float | None = None
+
+    def is_empty(self) -> bool:
+        return (
+            self.category is None
+            and self.min_price is None
+            and self.max_price is None
+            and self.min_rating is None
+        )
+
+    def key(self) -> tuple:
+        return (self.category, self.min_price, self.max_price, self.min_rating)
+
+    def mask(self, columns: CatalogColumns) -> np.ndarray:
+        """Bitmap of catalog rows passing every constraint (unknown price/rating fails a bound)."""
+        mask = np.ones(len(columns), dtype=bool)
+        if self.category is not None:
+            mask &= columns.categories.get(self.category.strip().lower(), np.zeros(len(columns), dtype=bool))
+        with np.errstate(invalid="ignore"):
+            if self.min_price is not None:
+                mask &= columns.price >= self.min_price
+            if self.max_price is not None:
+                mask &= columns.price <= self.max_price
+            if self.min_rating is not None:
+                mask &= columns.rating >= self.min_rating
+        return mask
+
+
+def _num(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _price_match(pattern: re.Pattern, text: str) -> re.Match | None:
+    """First match that reads as money: it has a $ / currency word, or no unit follows the number."""
+    for m in pattern.finditer(text):
+        if _CURRENCY.search(m.group(0)) or not _UNIT.match(text, m.end()):
+            return m
+    return None
+
+
+def _rating_match(text: str) -> re.Match | None:
+    """First rating phrase; "rated N" only counts when no unit follows ("rated 2 person tent")."""
+    m = _RATING_MIN.search(text)
+    if m:
+        return m
+    for m in _RATING_ABOVE.finditer(text):
+        if not _UNIT.match(text, m.end()):
+            return m
+    return None
+
+
+def parse_filters(query: str) -> tuple[str, SearchFilters]:
+    """
+    Pull price and rating constraints out of free text, e.g.
+    "headphones under $100 with 4+ stars" -> ("headphones", max_price=100, min_rating=4).
+    Returns the query with the matched phrases removed (for embedding) and the filters.
+    """
+    filters = SearchFilters()
+    text = query
+
+    def cut(match: re.Match) -> None:
+        nonlocal text
+        text = text.replace(match.group(0), " ", 1)
+
+    # Ratings first, so "4+ stars" is never read as a price
+    m = _rating_match(text)
+    if m and 0 < float(m.group(1)) <= 5:
+        filters.min_rating = float(m.group(1))
+        cut(m)
+
+    m = _price_match(_PRICE_BETWEEN, text) or _price_match(_PRICE_RANGE, text)
+    if m:
+        lo, hi = sorted((_num(m.group(1)), _num(m.group(2))))
+        filters.min_price, filters.max_price = lo, hi
+        cut(m)
+    else:
+        m = _price_match(_PRICE_MAX, text)
+        if m:
+            filters.max_price = _num(m.group(1))
+            cut(m)
+        m = _price_match(_PRICE_MIN, text)
+        if m:
+            filters.min_price = _num(m.group(1))
+            cut(m)
+
+    if filters.is_empty():
+        return query, filters
+    cleaned = re.sub(r"\b(?:with|and|that\s+(?:is|are)|priced)\s*$", "", " ".join(text.split()), flags=re.IGNORECASE)
+    return cleaned.strip(" ,.") or query, filters
@@ -0,0 +1,143 @@
+"""Local intent classifier (no LLM call): regex rules, then nearest-centroid on example phrases."""
+
+import os
+import re
+from typing import Any
+
+import numpy as np
+
+from .bm25 import tokenize
+from .catalog import Catalog
+from .local_embeddings import LocalEmbedder
+
+# local: rules + centroids, LLM only below INTENT_MIN_CONFIDENCE. llm: always ask the LLM.
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "local").strip().lower()
+# Minimum confidence to trust the local call instead of asking the LLM
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.1"))
+# Centroid margin (best over runner-up) below which the centroids abstain (confidence 0).
+# 20 hashed n-gram examples per class are a weak signal; measure changes with eval_intent.py.
+INTENT_CENTROID_MARGIN = float(os.getenv("INTENT_CENTROID_MARGIN", "0.35"))
+# Share of message terms that are distinctive catalog terms needed to call it a SEARCH
+INTENT_VOCAB_COVERAGE = float(os.getenv("INTENT_VOCAB_COVERAGE", "0.6"))
+# A catalog term is distinctive when at most this fraction of products use it in name/category
+INTENT_VOCAB_MAX_DF = float(os.getenv("INTENT_VOCAB_MAX_DF", "0.1"))
+
+# Anything that asks for, about, or around products
+_SEARCH_RULE = re.compile(
+    r"\$\s*\d|\b(?:recommend\w*|suggest\w*|find|search\w*|looking\s+for|look\s+for|show\s+me|"
+    r"need\s+(?:a|an|some|new)|want\s+(?:a|an|some|to\s+buy)|buy|shop\w*|purchase|price[sd]?|"
+    r"cost\w*|cheap\w*|budget|affordable|deals?|reviews?|ratings?|rated|stars?|specs?|"
+    r"specifications?|compare|comparison|cheaper|which\s+one|"
+    r"the\s+(?:first|second|third|last)(?:\s+one)?|(?:that|this)\s+one|tell\s+me\s+more|more\s+about|"
+    r"the\s+difference|between\s+them|compare\s+them|in\s+stock|gift|under\s+\d+|"
+    r"(?:need|want)\s+(?!help\b|to\s+(?:talk|chat|know)\b)\w+|do\s+you\s+(?:sell|have|carry|stock)|"
+    r"(?:is|does)\s+(?:it|this|that)(?:\s+one)?\s+(?:come\s+with|have|has|work\s+with|fit|support|"
+    r"include|waterproof|water\s+resistant|wireless|durable|comfortable|compatible|worth|available|"
+    r"last|charge|run\s+(?:small|large|big|true)))\b",
+    re.IGNORECASE,
+)
+# Product-quality words, which only mean SEARCH when not asked about the assistant itself
+_QUALITY_RULE = re.compile(r"\b(?:features?|better|best)\b", re.IGNORECASE)
+_ABOUT_ASSISTANT = re.compile(r"\b(?:you|your|yours|yourself)\b", re.IGNORECASE)
+# Whole-message small talk and questions about the assistant (so "hi, I need shoes" is not CHAT)
+_CHAT_RULE = re.compile(
+    r"^\W*(?:(?:hi|hello|hey|hiya|howdy|yo|greetings|good\s+(?:morning|afternoon|evening))"
+    r"(?:\s+(?:there|palona|again))?|thanks?(?:\s+you)?(?:\s+so\s+much)?|thx|ty|bye|goodbye|"
+    r"see\s+you|ok(?:ay)?|cool|great|nice|awesome|who\s+are\s+you|what(?:'?s|\s+is)\s+your\s+name|"
+    r"what\s+can\s+you\s+do|what\s+do\s+you\s+do|how\s+are\s+you(?:\s+doing)?|"
+    r"are\s+you\s+(?:a\s+|an\s+)?(?:bot|robot|ai|human|real)|what\s+are\s+you)\W*$",
+    re.IGNORECASE,
+)
+
+# Labeled examples; their mean embeddings are the class centroids
+EXAMPLES = {
+    "CHAT": [
+        "hello there", "hi how is it going", "good morning", "who made you",
+        "tell me about yourself", "what is your name", "what can you help me with",
+        "how does this work", "can you help me", "nice to meet you", "thank you so much",
+        "that was helpful", "tell me a joke", "what's the weather like", "how old are you",
+        "are you an ai assistant", "what do you know", "goodbye for now", "i'm just browsing",
+        "who are you exactly",
+    ],
+    "SEARCH": [
+        "recommend a t-shirt for sports", "i need running shoes", "wireless headphones",
+        "show me laptops", "looking for a gift for my dad", "best phone for photos",
+        "cheap bluetooth speaker", "a dress for a wedding", "how are the reviews",
+        "what are the specs of the first one", "compare them", "noise cancelling earbuds",
+        "winter jacket for men", "something for the kitchen", "do you have backpacks",
+        "are there any smart watches", "toys for a 5 year old", "gaming mouse",
+        "jeans in size 32", "find me a coffee maker",
+    ],
+}
+
+# Fixed uniform-weight embedder: no fitted file needed, identical vectors in every process
+_embedder = LocalEmbedder()
+_labels: list[str] = []
+_centroids: np.ndarray | None = None
+
+
+def _get_centroids() -> tuple[list[str], np.ndarray]:
+    global _labels, _centroids
+    if _centroids is None:
+        _labels = list(EXAMPLES)
+        means = np.stack([_embedder.embed_batch(EXAMPLES[label]).mean(axis=0) for label in _labels])
+        _centroids = means / (np.linalg.norm(means, axis=1, keepdims=True) + 1e-9)
+    return _labels, _centroids
+
+
+_vocab: tuple[Any, set[str]] | None = None
+
+
+def catalog_vocabulary(catalog: list[dict[str, Any]]) -> set[str]:
+    """
+    Distinctive terms of product names and categories (document frequency at most
+    INTENT_VOCAB_MAX_DF): kept on a Catalog snapshot, else per catalog object.
+    """
+    global _vocab
+    if isinstance(catalog, Catalog) and "intent_vocab" in catalog.derived:
+        return catalog.derived["intent_vocab"]
+    if _vocab is not None and _vocab[0] is catalog:
+        return _vocab[1]
+    df: dict[str, int] = {}
+    for p in catalog:
+        for term in set(tokenize(f"{p.get('name', '')} {p.get('category', '')}")):
+            df[term] = df.get(term, 0) + 1
+    max_df = max(1, int(INTENT_VOCAB_MAX_DF * len(catalog)))
+    vocab = {term for term, n in df.items() if n <= max_df}
+    if isinstance(catalog, Catalog):
+        catalog.derived["intent_vocab"] = vocab
+    else:
+        _vocab = (catalog, vocab)
+    return vocab
+
+
+def classify_intent(message: str, catalog: list[dict[str, Any]] | None = None) -> tuple[str, float]:
+    """
+    (CHAT | SEARCH, confidence) without any network call, in order:
+    regex rules (confidence 1.0, or 0.0 for quality words addressed to the assistant);
+    with a catalog, at least two distinctive catalog terms making up most of the message
+    ("mens hoodie", "4k tv"), with confidence coverage - (1 - coverage) scaled to at most
+    0.5; else the nearest class centroid, with its cosine margin over the runner-up when
+    that reaches INTENT_CENTROID_MARGIN and 0.0 otherwise. Callers compare confidence to
+    INTENT_MIN_CONFIDENCE.
+    """
+    text = (message or "").strip()
+    if not text or _CHAT_RULE.match(text):
+        return "CHAT", 1.0
+    if _SEARCH_RULE.search(text):
+        return "SEARCH", 1.0
+    if _QUALITY_RULE.search(text):
+        # "are you better than alexa?" vs "what's your best laptop?": leave it to the LLM
+        return ("CHAT", 0.0) if _ABOUT_ASSISTANT.search(text) else ("SEARCH", 1.0)
+    if catalog:
+        terms = [t for t in tokenize(text) if len(t) > 1]
+        vocab = catalog_vocabulary(catalog)
+        hits = sum(t in vocab for t in terms)
+        coverage = hits / len(terms) if terms else 0.0
+        if hits >= 2 and coverage >= INTENT_VOCAB_COVERAGE:
+            return "SEARCH", round(0.5 * (2 * coverage - 1), 3)
+    labels, centroids = _get_centroids()
+    scores = centroids @ _embedder.embed(text)
+    order = np.argsort(-scores)
+    margin = float(scores[order[0]] - scores[order[1]])
+    return labels[order[0]], margin if margin >= INTENT_CENTROID_MARGIN else 0.0
@@ -1,9 +1,16 @@
 """LLM adapter: Ollama (local) with fallback to Groq (deployed)."""
 
+import asyncio
 import base64
+import importlib.util
+import json
 import os
+import time
+from collections.abc import AsyncIterator
 from typing import Any
 
+from .resilience import CircuitBreaker, LatencyTracker, backoff_delay
+
 # Try Ollama first (local)
 try:
     import httpx
@@ -12,6 +19,7 @@ except ImportError:
 
 
 OLLAMA_BASE = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+GROQ_BASE = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
 GROQ_API_KEY = (os.getenv("GROQ_API_KEY") or "").strip()
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 GROQ_VISION_MODEL = os.getenv(
@@ -21,57 +29,335 @@ GROQ_VISION_MODEL = os.getenv(
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
 OLLAMA_VISION_MODEL = os.getenv("OLLAMA_VISION_MODEL", "llava")
 
+# Shared connection pool for both providers (keep-alive; HTTP/2 over TLS when h2 is installed)
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") != "0"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+
+# Chat providers in failover order, e.g. "groq,ollama" (default: Groq if keyed, else Ollama)
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # per provider, transient errors only
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.25"))
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", "4"))
+LLM_TIMEOUT_BUDGET = float(os.getenv("LLM_TIMEOUT_BUDGET", "60"))  # whole chat_completion call
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# Hedging: if the primary is slower than its p<LLM_HEDGE_PERCENTILE> latency, also ask the backup
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2.0"))  # until enough latency samples exist
+
+_http_client: "httpx.AsyncClient | None" = None
+_breakers: dict[str, CircuitBreaker] = {}
+_latency: dict[str, LatencyTracker] = {}
+
+
+def init_http_client() -> None:
+    """Create the process-wide LLM HTTP client (FastAPI startup)."""
+    global _http_client
+    if _http_client is not None:
+        return
+    _http_client = httpx.AsyncClient(
+        http2=LLM_HTTP2 and importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(60.0, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def close_http_client() -> None:
+    """Close the pooled client (FastAPI shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def _client() -> "httpx.AsyncClient":
+    """The shared client; created on first use outside the app (scripts)."""
+    if _http_client is None:
+        init_http_client()
+    return _http_client
+
+
+def _timeout(seconds: float) -> "httpx.Timeout":
+    """Per-request read/write budget; connecting is always capped at LLM_CONNECT_TIMEOUT."""
+    return httpx.Timeout(seconds, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _groq_headers() -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
 
 def _use_groq() -> bool:
     """Use Groq when API key is set (deployed mode)."""
     return bool(GROQ_API_KEY)
 
 
+def _providers() -> list[str]:
+    """Configured chat providers in failover order (Groq needs an API key)."""
+    names = [n.strip().lower() for n in LLM_PROVIDERS.split(",") if n.strip()]
+    if not names:
+        names = ["groq" if _use_groq() else "ollama"]
+    return [n for n in names if n in ("groq", "ollama") and (n != "groq" or GROQ_API_KEY)]
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        _latency[name] = LatencyTracker()
+    return _breakers[name]
+
+
+def _is_transient(e: BaseException) -> tuple[bool, float | None]:
+    """(retryable, server-suggested delay) for timeouts, connection errors, 429 and 5xx."""
+    if isinstance(e, (httpx.TimeoutException, httpx.TransportError)):
+        return True, None
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        if status in (408, 409, 429) or status >= 500:
+            try:
+                return True, float(e.response.headers.get("retry-after", ""))
+            except ValueError:
+                return True, None
+    return False, None
+
+
+async def _call_provider(name: str, messages: list[dict[str, Any]], temperature: float) -> str:
+    """
+    One provider with jittered retries on transient errors. Every attempt goes through
+    the provider's circuit breaker and feeds its latency window.
+    """
+    call = _groq_chat if name == "groq" else _ollama_chat
+    breaker = _breaker(name)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not breaker.allow():
+            raise RuntimeError(f"LLM provider {name} circuit is open")
+        start = time.monotonic()
+        try:
+            result = await call(messages, temperature)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            retryable, retry_after = _is_transient(e)
+            if retryable:
+                breaker.record_failure()
+            else:
+                breaker.release()  # a bad request says nothing about provider health
+            if not retryable or attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, LLM_RETRY_BASE, LLM_RETRY_MAX, retry_after))
+            continue
+        breaker.record_success()
+        _latency[name].record(time.monotonic() - start)
+        return result
+    raise AssertionError("unreachable")
+
+
+def _hedge_delay(name: str) -> float:
+    return _latency[name].percentile(LLM_HEDGE_PERCENTILE) or LLM_HEDGE_DELAY
+
+
+async def _hedged(providers: list[str], messages: list[dict[str, Any]], temperature: float) -> str:
+    """
+    Ask the primary; if it hasn't answered within its hedge delay (or fails), also ask the
+    next provider. The first successful answer wins and the other request is cancelled.
+    """
+    pending: set[asyncio.Task] = set()
+    last_error: BaseException | None = None
+    try:
+        for i, name in enumerate(providers):
+            _breaker(name)
+            pending.add(asyncio.create_task(_call_provider(name, messages, temperature)))
+            last = i == len(providers) - 1
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if last else _hedge_delay(name),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break  # primary is slow: hedge to the next provider
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not last:
+                    break  # a failure: start the next provider right away
+        raise last_error or RuntimeError("No LLM provider available")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
 async def chat_completion(
     messages: list[dict[str, Any]],
     temperature: float = 0.7,
 ) -> str:
-    """Send chat completion request to Ollama or Groq."""
-    if _use_groq():
-        return await _groq_chat(messages, temperature)
-    return await _ollama_chat(messages, temperature)
+    """
+    Send chat completion request to the configured providers (LLM_PROVIDERS): retries
+    with jitter, per-provider circuit breakers, failover in order, and with LLM_HEDGE=1
+    a hedged request to the backup when the primary is slow. Bounded by LLM_TIMEOUT_BUDGET.
+    """
+    providers = _providers()
+    if not providers:
+        raise RuntimeError("No LLM provider configured (set GROQ_API_KEY or LLM_PROVIDERS).")
+    if LLM_HEDGE and len(providers) > 1:
+        return await asyncio.wait_for(_hedged(providers, messages, temperature), LLM_TIMEOUT_BUDGET)
+
+    async def failover() -> str:
+        last_error: Exception | None = None
+        for name in providers:
+            try:
+                return await _call_provider(name, messages, temperature)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    return await asyncio.wait_for(failover(), LLM_TIMEOUT_BUDGET)
+
+
+def provider_stats() -> dict[str, Any]:
+    """Circuit state and latency percentiles per chat provider, for /api/health."""
+    return {
+        name: {
+            "circuit": _breaker(name).state,
+            "consecutive_failures": _breaker(name).failures,
+            "latency": _latency[name].stats(),
+        }
+        for name in _providers()
+    }
 
 
 async def _ollama_chat(messages: list[dict[str, Any]], temperature: float) -> str:
     """Ollama chat API."""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        r = await client.post(
-            f"{OLLAMA_BASE}/api/chat",
-            json={
-                "model": OLLAMA_MODEL,
-                "messages": messages,
-                "stream": False,
-                "options": {"temperature": temperature},
-            },
-        )
-        r.raise_for_status()
-        data = r.json()
-        return data.get("message", {}).get("content", "").strip()
+    r = await _client().post(
+        f"{OLLAMA_BASE}/api/chat",
+        json={
+            "model": OLLAMA_MODEL,
+            "messages": messages,
+            "stream": False,
+            "options": {"temperature": temperature},
+        },
+        timeout=_timeout(60.0),
+    )
+    r.raise_for_status()
+    data = r.json()
+    return data.get("message", {}).get("content", "").strip()
 
 
 async def _groq_chat(messages: list[dict[str, Any]], temperature: float) -> str:
     """Groq chat API."""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        r = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": GROQ_MODEL,
-                "messages": messages,
-                "temperature": temperature,
-            },
-        )
+    r = await _client().post(
+        f"{GROQ_BASE}/chat/completions",
+        headers=_groq_headers(),
+        json={
+            "model": GROQ_MODEL,
+            "messages": messages,
+            "temperature": temperature,
+        },
+        timeout=_timeout(60.0),
+    )
+    r.raise_for_status()
+    data = r.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def chat_completion_stream(
+    messages: list[dict[str, Any]],
+    temperature: float = 0.7,
+) -> AsyncIterator[str]:
+    """
+    Like chat_completion, but yields the answer in chunks as the provider generates it.
+    Fails over to the next provider only before the first chunk; no retries or hedging.
+    """
+    last_error: Exception | None = None
+    for name in _providers():
+        breaker = _breaker(name)
+        if not breaker.allow():
+            continue
+        stream = _groq_chat_stream if name == "groq" else _ollama_chat_stream
+        started = False
+        try:
+            async for text in stream(messages, temperature):
+                started = True
+                yield text
+        except Exception as e:
+            if not started and _is_transient(e)[0]:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            if started:
+                raise
+            last_error = e
+            continue
+        except BaseException:
+            breaker.release()  # client went away mid-stream
+            raise
+        breaker.record_success()
+        return
+    raise last_error or RuntimeError("No LLM provider available")
+
+
+async def _ollama_chat_stream(messages: list[dict[str, Any]], temperature: float) -> AsyncIterator[str]:
+    """Ollama chat API with stream=true: one JSON object per line."""
+    async with _client().stream(
+        "POST",
+        f"{OLLAMA_BASE}/api/chat",
+        json={
+            "model": OLLAMA_MODEL,
+            "messages": messages,
+            "stream": True,
+            "options": {"temperature": temperature},
+        },
+        timeout=_timeout(60.0),
+    ) as r:
         r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"].strip()
+        async for line in r.aiter_lines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            text = data.get("message", {}).get("content", "")
+            if text:
+                yield text
+            if data.get("done"):
+                break
+
+
+async def _groq_chat_stream(messages: list[dict[str, Any]], temperature: float) -> AsyncIterator[str]:
+    """Groq chat API with stream=true: OpenAI-style server-sent events."""
+    async with _client().stream(
+        "POST",
+        f"{GROQ_BASE}/chat/completions",
+        headers=_groq_headers(),
+        json={
+            "model": GROQ_MODEL,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        },
+        timeout=_timeout(60.0),
+    ) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:") :].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            text = choices[0].get("delta", {}).get("content") or ""
+            if text:
+                yield text
 
 
 async def describe_image(image_base64: str) -> str:
@@ -97,29 +383,29 @@ async def _ollama_vision(image_base64: str) -> str:
     """Ollama LLaVA for image description. Expects raw base64 (no data URL prefix)."""
     raw_base64 = _extract_base64(image_base64)
 
-    async with httpx.AsyncClient(timeout=90.0) as client:
-        r = await client.post(
-            f"{OLLAMA_BASE}/api/chat",
-            json={
-                "model": OLLAMA_VISION_MODEL,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": (
-                            "Describe this image in detail for product search. "
-                            "Focus on: clothing style, colors, type of product, "
-                            "materials, occasion, and any visible features. "
-                            "Output a short product search query (1-2 sentences)."
-                        ),
-                        "images": [raw_base64],
-                    }
-                ],
-                "stream": False,
-            },
-        )
-        r.raise_for_status()
-        data = r.json()
-        return data.get("message", {}).get("content", "").strip()
+    r = await _client().post(
+        f"{OLLAMA_BASE}/api/chat",
+        json={
+            "model": OLLAMA_VISION_MODEL,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": (
+                        "Describe this image in detail for product search. "
+                        "Focus on: clothing style, colors, type of product, "
+                        "materials, occasion, and any visible features. "
+                        "Output a short product search query (1-2 sentences)."
+                    ),
+                    "images": [raw_base64],
+                }
+            ],
+            "stream": False,
+        },
+        timeout=_timeout(90.0),
+    )
+    r.raise_for_status()
+    data = r.json()
+    return data.get("message", {}).get("content", "").strip()
 
 
 async def _groq_vision(image_base64: str) -> str:
@@ -127,41 +413,57 @@ async def _groq_vision(image_base64: str) -> str:
     if not image_base64.startswith("data:"):
         image_base64 = f"data:image/jpeg;base64,{image_base64}"
 
-    async with httpx.AsyncClient(timeout=90.0) as client:
-        r = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": GROQ_VISION_MODEL,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": (
-                                    "Describe this image for product search. "
-                                    "Focus on: clothing style, colors, product type, "
-                                    "materials, occasion. Output 1-2 sentences as a product search query."
-                                ),
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_base64},
-                            },
-                        ],
-                    }
-                ],
-                "max_tokens": 150,
-            },
+    r = await _client().post(
+        f"{GROQ_BASE}/chat/completions",
+        headers=_groq_headers(),
+        json={
+            "model": GROQ_VISION_MODEL,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": (
+                                "Describe this image for product search. "
+                                "Focus on: clothing style, colors, product type, "
+                                "materials, occasion. Output 1-2 sentences as a product search query."
+                            ),
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_base64},
+                        },
+                    ],
+                }
+            ],
+            "max_tokens": 150,
+        },
+        timeout=_timeout(90.0),
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"Groq vision API error {r.status_code}: {r.text}")
+    data = r.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def warm_up() -> str:
+    """
+    Prime the chat backend so the first user request doesn't pay for it. Ollama: a
+    prompt-less generate call loads the model into memory. Groq: list models, which checks
+    the API key and leaves a handshaken connection in the shared pool. Returns the model name.
+    """
+    if _use_groq():
+        r = await _client().get(
+            f"{GROQ_BASE}/models", headers=_groq_headers(), timeout=_timeout(30.0)
         )
-        if r.status_code != 200:
-            raise RuntimeError(f"Groq vision API error {r.status_code}: {r.text}")
-        data = r.json()
-        return data["choices"][0]["message"]["content"].strip()
+        r.raise_for_status()
+        return GROQ_MODEL
+    r = await _client().post(
+        f"{OLLAMA_BASE}/api/generate", json={"model": OLLAMA_MODEL}, timeout=_timeout(300.0)
+    )
+    r.raise_for_status()
+    return OLLAMA_MODEL
 
 
 def is_ollama_available() -> bool:
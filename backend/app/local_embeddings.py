@@ -0,0 +1,105 @@
+"""Offline embedding provider: hashed character n-grams with IDF weights, no network needed."""
+
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+LOCAL_EMBED_MODEL = "local-hashed-ngram-v1"
+LOCAL_EMBED_DIM = 512
+LOCAL_NGRAM_RANGE = (3, 5)
+DEFAULT_EMBEDDER_PATH = Path(__file__).parent.parent / "data" / "local_embedder.npz"
+
+
+def _ngram_buckets(text: str, dim: int, ngram_range: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """(bucket, sign) per character n-gram of each word, padded with word boundaries."""
+    buckets: list[int] = []
+    signs: list[float] = []
+    lo, hi = ngram_range
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"<{word}>"
+        for n in range(lo, hi + 1):
+            for i in range(max(len(padded) - n + 1, 1)):
+                h = zlib.crc32(padded[i : i + n].encode())
+                buckets.append(h % dim)
+                signs.append(1.0 if (h >> 31) & 1 else -1.0)
+    return np.array(buckets, dtype=np.int64), np.array(signs, dtype=np.float32)
+
+
+class LocalEmbedder:
+    """
+    Signed feature hashing of character n-grams into `dim` buckets, weighted by per-bucket IDF
+    fitted on the catalog. Deterministic across processes (crc32, not Python's salted hash),
+    so product vectors built offline match query vectors at runtime.
+    """
+
+    def __init__(
+        self,
+        dim: int = LOCAL_EMBED_DIM,
+        ngram_range: tuple[int, int] = LOCAL_NGRAM_RANGE,
+        idf: np.ndarray | None = None,
+    ):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.idf = idf if idf is not None else np.ones(dim, dtype=np.float32)
+
+    def fit(self, texts: list[str]) -> "LocalEmbedder":
+        """Learn smoothed IDF per bucket from the corpus."""
+        df = np.zeros(self.dim, dtype=np.float32)
+        for text in texts:
+            buckets, _ = _ngram_buckets(text, self.dim, self.ngram_range)
+            df[np.unique(buckets)] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length float32 vector for one text."""
+        buckets, signs = _ngram_buckets(text, self.dim, self.ngram_range)
+        vec = np.zeros(self.dim, dtype=np.float32)
+        np.add.at(vec, buckets, signs)
+        vec *= self.idf
+        return vec / (np.linalg.norm(vec) + 1e-9)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        return np.stack([self.embed(t) for t in texts]) if texts else np.empty((0, self.dim), np.float32)
+
+    def save(self, path: Path = DEFAULT_EMBEDDER_PATH) -> None:
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, idf=self.idf, ngram_range=np.array(self.ngram_range), model=np.array(LOCAL_EMBED_MODEL))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_EMBEDDER_PATH) -> "LocalEmbedder":
+        with np.load(path) as data:
+            if str(data["model"]) != LOCAL_EMBED_MODEL:
+                raise ValueError(f"{path} was built by {data['model']}, expected {LOCAL_EMBED_MODEL}.")
+            idf = data["idf"].astype(np.float32)
+            lo, hi = (int(x) for x in data["ngram_range"])
+        return cls(dim=len(idf), ngram_range=(lo, hi), idf=idf)
+
+
+_embedder: LocalEmbedder | None = None
+
+
+def load_local_embedder(path: Path = DEFAULT_EMBEDDER_PATH) -> LocalEmbedder:
+    """Fitted embedder from data/local_embedder.npz (written by precompute_embeddings.py), uncached."""
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Local embedder not found at {path}. Run precompute_embeddings.py --provider local first."
+        )
+    return LocalEmbedder.load(path)
+
+
+def get_local_embedder() -> LocalEmbedder:
+    """Process-wide fitted embedder, loaded once (snapshots carry their own, see embeddings)."""
+    global _embedder
+    if _embedder is None:
+        _embedder = load_local_embedder()
+    return _embedder
+
+
+def compute_local_embedding(text: str, embedder: LocalEmbedder | None = None) -> list[float]:
+    """Embed a query fully offline."""
+    return (embedder or get_local_embedder()).embed(text).tolist()
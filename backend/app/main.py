@@ -7,31 +7,47 @@ from dotenv import load_dotenv
 # Load .env before any app code reads env vars
 load_dotenv(Path(__file__).parent.parent / ".env")
 
+import asyncio
+import json
+import os
+import secrets
 from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .agent import process_message
-from .catalog import load_catalog
-from .retrieval import init_in_background, is_ready
+from .agent import process_message, process_message_stream, response_cache_stats
+from . import snapshot, warmup
+from .catalog import get_product_by_id
+from .embeddings import close_async_client, init_async_client, query_cache_stats
+from .llm import close_http_client, init_http_client, provider_stats
+from .retrieval import search_cache_stats, search_products_batch
 from .state import get_or_create_session, update_session
 
-# Global catalog (ChromaDB/embeddings warm up in background)
-catalog: list[dict[str, Any]] = []
+# Shared secret for /api/admin/* (admin endpoints are disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load catalog and start retrieval warm-up in background. App binds to port immediately."""
-    global catalog
-    catalog = load_catalog()
-    init_in_background(catalog)
+    snapshot.install(snapshot.build_snapshot(warm=False))
+    init_async_client()
+    init_http_client()
+    warming = warmup.init_in_background(snapshot.current())
+    watcher = None
+    if snapshot.SNAPSHOT_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(snapshot.watch())
     yield
+    warming.cancel()
+    if watcher is not None:
+        watcher.cancel()
+    await close_async_client()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -74,49 +90,120 @@ class ChatResponse(BaseModel):
     session_id: str | None = None  # Returned when new session created
 
 
+class BatchSearchRequest(BaseModel):
+    """Batch search request body."""
+
+    queries: list[str] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(5, ge=1, le=50)
+
+
+class BatchSearchResult(BaseModel):
+    query: str
+    products: list[dict[str, Any]] = []
+
+
+class BatchSearchResponse(BaseModel):
+    """Batch search response body: one entry per query, in request order."""
+
+    results: list[BatchSearchResult]
+
+
 @app.get("/api/health")
 async def health():
-    """Health check endpoint. ready=true when retrieval is warmed up."""
-    ready = is_ready()
+    """Health check endpoint. ready=true when retrieval is warmed up; warmup has per-component status."""
     return {
-        "status": "ok" if ready else "warming_up",
-        "ready": ready,
-        "catalog_size": len(catalog),
+        "status": warmup.status(),
+        "ready": warmup.is_ready(),
+        "catalog_size": len(snapshot.current()),
+        "snapshot": snapshot.info(),
+        "warmup": warmup.info(),
+        "embedding_cache": query_cache_stats(),
+        "search_cache": search_cache_stats(snapshot.current()),
+        "response_cache": response_cache_stats(),
+        "llm": provider_stats(),
     }
 
 
+@app.post("/api/admin/reload")
+async def admin_reload(x_admin_token: str = Header(default="")):
+    """Rebuild catalog + search indexes in the background and swap them in without a restart."""
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        await snapshot.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}") from e
+    return snapshot.info()
+
+
 @app.get("/api/products")
 async def list_products():
     """List all products in the catalog."""
-    return {"products": catalog}
+    return {"products": snapshot.current()}
+
+
+@app.get("/api/products/{product_id}")
+async def get_product(product_id: str):
+    """Get a single product by id (ASIN)."""
+    product = get_product_by_id(product_id, snapshot.current())
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    return product
+
+
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """Search many queries in one call (offline jobs: evaluation, catalog QA, cache warming)."""
+    try:
+        ranked = await search_products_batch(
+            request.queries, snapshot.current(), top_k=request.top_k
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return BatchSearchResponse(
+        results=[
+            BatchSearchResult(query=q, products=products)
+            for q, products in zip(request.queries, ranked)
+        ]
+    )
+
+
+def _warming_up_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": "Service warming up. First load takes 1–2 minutes. Please retry in 60 seconds.",
+            "ready": False,
+        },
+        headers={"Retry-After": "60"},
+    )
+
+
+def _load_session(request: ChatRequest) -> tuple[str, list[dict[str, str]], list[dict[str, Any]]]:
+    """(session_id, history, previous_products): server-side state, else the request's fallback."""
+    session_id, state = get_or_create_session(request.session_id)
+    history = [{"role": h["role"], "content": h["content"]} for h in state["messages"]]
+    previous_products = state["products"]
+    if not history and request.history:
+        history = [{"role": h.role, "content": h.content} for h in request.history]
+    if not previous_products and request.previous_products:
+        previous_products = request.previous_products
+    return session_id, history, previous_products
 
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Main agent endpoint: text + optional image."""
-    if not is_ready():
-        return JSONResponse(
-            status_code=503,
-            content={
-                "detail": "Service warming up. First load takes 1–2 minutes. Please retry in 60 seconds.",
-                "ready": False,
-            },
-            headers={"Retry-After": "60"},
-        )
+    if not warmup.is_ready():
+        return _warming_up_response()
     try:
         # Use server-side state when session_id provided
-        session_id, state = get_or_create_session(request.session_id)
-        history = [{"role": h["role"], "content": h["content"]} for h in state["messages"]]
-        previous_products = state["products"]
-        if not history and request.history:
-            history = [{"role": h.role, "content": h.content} for h in request.history]
-        if not previous_products and request.previous_products:
-            previous_products = request.previous_products
+        session_id, history, previous_products = _load_session(request)
 
         result = await process_message(
             message=request.message,
             image_base64=request.image_base64,
-            catalog=catalog,
+            catalog=snapshot.current(),
             history=history,
             previous_products=previous_products,
         )
@@ -137,3 +224,50 @@ async def chat(request: ChatRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /api/chat, streamed as Server-Sent Events:
+    `meta` (intent, products, session_id) once retrieval is done, then one `token` event per
+    LLM chunk, then `done` (full response) after the session is updated, or `error`.
+    """
+    if not warmup.is_ready():
+        return _warming_up_response()
+    session_id, history, previous_products = _load_session(request)
+
+    async def events():
+        try:
+            async for event in process_message_stream(
+                message=request.message,
+                image_base64=request.image_base64,
+                catalog=snapshot.current(),
+                history=history,
+                previous_products=previous_products,
+            ):
+                kind = event.pop("type")
+                if kind == "meta":
+                    yield _sse("meta", {**event, "session_id": session_id})
+                elif kind == "token":
+                    yield _sse("token", event)
+                else:
+                    update_session(
+                        session_id,
+                        user_message=request.message,
+                        assistant_message=event["response"],
+                        products=event.get("products", []),
+                    )
+                    yield _sse("done", {"response": event["response"], "session_id": session_id})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
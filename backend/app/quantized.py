@@ -0,0 +1,83 @@
+"""int8 scalar-quantized embedding index with float32 rerank of the top candidates."""
+
+import numpy as np
+
+from .embeddings import EmbeddingIndex, _top_rows, _unit
+
+# Rows upcast per scan step; sized so the float32 block stays cache-resident
+_SCAN_BLOCK = 256
+
+
+class Int8Index:
+    """
+    Each row is stored as int8 codes with per-dimension (or one global) scale:
+    x[d] ~= codes[d] * scale[d]. A query scans every row in int8 (scale folded into the query),
+    then rescores the best `rerank` candidates against the float32 rows of the base index.
+    Resident memory is ~1 byte per dimension instead of 4; the float base is only touched
+    for reranking, so it can stay memory-mapped.
+    """
+
+    def __init__(self, base: EmbeddingIndex, codes: np.ndarray, scale: np.ndarray, rerank: int = 100):
+        self.base = base
+        self.ids = base.ids
+        self.mask_for = base.mask_for
+        self.codes = codes
+        self.scale = scale.astype(np.float32)
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    @classmethod
+    def build(cls, base: EmbeddingIndex, per_dimension: bool = True, rerank: int = 100) -> "Int8Index":
+        """Quantize the base matrix symmetrically to [-127, 127], one block at a time."""
+        matrix = base.matrix
+        dim = base.dim
+        max_abs = np.zeros(dim, dtype=np.float32)
+        for start in range(0, len(matrix), 65536):
+            block = np.abs(np.asarray(matrix[start : start + 65536], dtype=np.float32))
+            np.maximum(max_abs, block.max(axis=0), out=max_abs)
+        if not per_dimension:
+            max_abs[:] = max_abs.max()
+        scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+
+        codes = np.empty((len(matrix), dim), dtype=np.int8)
+        for start in range(0, len(matrix), 65536):
+            block = np.asarray(matrix[start : start + 65536], dtype=np.float32)
+            codes[start : start + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+        return cls(base, codes, scale, rerank=rerank)
+
+    def approx_scores(self, query_emb: list[float] | np.ndarray) -> np.ndarray:
+        """First pass over the int8 codes. NumPy has no fast int8 GEMV, so each block is
+        upcast into a small reused float32 buffer and hits BLAS."""
+        q = _unit(query_emb) * self.scale
+        out = np.empty(len(self.codes), dtype=np.float32)
+        buf = np.empty((_SCAN_BLOCK, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), _SCAN_BLOCK):
+            block = self.codes[start : start + _SCAN_BLOCK]
+            b = buf[: len(block)]
+            np.copyto(b, block, casting="unsafe")
+            np.dot(b, q, out=out[start : start + len(block)])
+        return out
+
+    def search(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """int8 scan for max(k, rerank) candidates, float32 rerank, top-k (rows, scores)."""
+        approx = self.approx_scores(query_emb)
+        if mask is not None:
+            approx[~mask] = -np.inf
+        candidates = np.sort(_top_rows(approx, max(k, self.rerank)))
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        scores = np.asarray(self.base.matrix[candidates], dtype=np.float32) @ _unit(query_emb)
+        top = _top_rows(scores, k)
+        return candidates[top], scores[top]
+
+    def memory_bytes(self) -> int:
+        return int(self.codes.nbytes + self.scale.nbytes)
@@ -0,0 +1,114 @@
+"""Semantic cache of full agent answers, matched by query-embedding similarity."""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from .embeddings import _unit, normalize_query
+
+# Opt-in: a hit skips intent detection, search and answer generation entirely
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Cosine similarity a new query needs to a cached one to reuse its answer
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+
+
+class SemanticResponseCache:
+    """
+    Bounded LRU of answered queries: (unit embedding, filters key, agent result). A lookup
+    scores the query against every cached embedding at once and reuses the best answer
+    above `threshold`. Entries only match under identical filters ("under $50" and
+    "under $500" embed almost the same), and everything is dropped when the catalog
+    version changes.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = ""
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, np.ndarray, tuple, dict[str, Any]]] = OrderedDict()
+        # Stacked embeddings + their keys; rebuilt only after inserts/deletes (LRU bumps keep it valid)
+        self._keys: list[str] = []
+        self._matrix: np.ndarray | None = None
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def get(
+        self, query_emb: list[float] | np.ndarray, filters_key: tuple, version: str
+    ) -> dict[str, Any] | None:
+        self._check_version(version)
+        now = time.monotonic()
+        expired = [k for k, entry in self._entries.items() if entry[0] <= now]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix = None
+        if not self._entries:
+            self.misses += 1
+            return None
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([entry[1] for entry in self._entries.values()])
+        scores = self._matrix @ _unit(query_emb)
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                break
+            entry = self._entries[self._keys[i]]
+            if entry[2] == filters_key:
+                self._entries.move_to_end(self._keys[i])
+                self.hits += 1
+                return {**entry[3], "products": list(entry[3]["products"])}
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        query: str,
+        query_emb: list[float] | np.ndarray,
+        filters_key: tuple,
+        version: str,
+        result: dict[str, Any],
+    ) -> None:
+        if self.max_size <= 0:
+            return
+        self._check_version(version)
+        key = f"{normalize_query(query)}|{filters_key}"
+        self._entries[key] = (time.monotonic() + self.ttl, _unit(query_emb), filters_key, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": RESPONSE_CACHE,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,24 +1,413 @@
 """Retrieval engine for product search using pre-computed OpenAI embeddings."""
 
+import os
+from collections import OrderedDict
+from pathlib import Path
 from typing import Any
 
-from .embeddings import search_products as _embedding_search
+import numpy as np
 
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .catalog import Catalog, get_columns
+from .embeddings import (
+    EMBED_FALLBACK_LOCAL,
+    EMBED_PROVIDER,
+    EmbeddingIndex,
+    MatryoshkaIndex,
+    compute_embedding,
+    compute_embedding_async,
+    compute_embeddings_async,
+    get_index,
+    load_index,
+    local_index_available,
+    normalize_query,
+    rank_products,
+    rank_products_batch,
+    relevance_threshold,
+    store_path_for,
+)
+from .filters import SearchFilters
 
-def is_ready() -> bool:
-    """Always ready — no warm-up needed with pre-computed embeddings."""
-    return True
+# exact: brute-force cosine over every row (reference). ivf: approximate IVF-Flat (app/ann.py).
+# int8: scalar-quantized scan + float32 rerank (app/quantized.py).
+# matryoshka: scan on a truncated prefix of each vector, rerank candidates at full width.
+# streaming: exact, but scans the memmapped store in blocks (app/streaming.py) for catalogs
+# larger than RAM.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "exact").strip().lower()
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = ~4*sqrt(N)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+INT8_RERANK = int(os.getenv("INT8_RERANK", "100"))
+INT8_PER_DIMENSION = os.getenv("INT8_PER_DIMENSION", "1") != "0"
+MRL_DIMS = int(os.getenv("MRL_DIMS", "256"))
+MRL_CANDIDATES = int(os.getenv("MRL_CANDIDATES", "200"))
+STREAM_BLOCK_ROWS = int(os.getenv("STREAM_BLOCK_ROWS", "16384"))
 
+# vector: embeddings only. hybrid: BM25 + vector fused with reciprocal-rank fusion.
+# lexical: BM25 only (no embedding call).
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").strip().lower()
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Hybrid skips the embedding call when the BM25 top hit covers the query and leads by this margin
+BM25_MIN_COVERAGE = float(os.getenv("BM25_MIN_COVERAGE", "1.0"))
+BM25_MIN_MARGIN = float(os.getenv("BM25_MIN_MARGIN", "1.5"))
+# Ranked results kept per catalog snapshot (0 disables the result cache)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
 
-def init_in_background(catalog: list[dict[str, Any]]) -> None:
-    """No-op: embeddings are pre-computed and loaded from JSON instantly."""
-    pass
+# provider -> search backend over that provider's product index
+_searchers: dict[str, Any] = {}
+_bm25: BM25Index | None = None
+
+
+def _load_or_build_ivf(base: EmbeddingIndex, path: Path) -> Any:
+    from .ann import IVFIndex
+
+    if path.exists():
+        try:
+            return IVFIndex.load(path, base, base.checksum, nprobe=IVF_NPROBE)
+        except (ValueError, KeyError, OSError):
+            pass  # stale or unreadable: rebuild below
+    ivf = IVFIndex.build(base, nlist=IVF_NLIST or None, nprobe=IVF_NPROBE)
+    try:
+        ivf.save(path, base.checksum)
+    except OSError:
+        pass  # read-only deploy: keep the in-memory index
+    return ivf
+
+
+def _build_searcher(base: EmbeddingIndex, provider: str) -> Any:
+    if SEARCH_BACKEND == "exact":
+        return base
+    if SEARCH_BACKEND == "ivf":
+        return _load_or_build_ivf(base, store_path_for(provider).with_suffix(".ivf.npz"))
+    if SEARCH_BACKEND == "int8":
+        from .quantized import Int8Index
+
+        return Int8Index.build(base, per_dimension=INT8_PER_DIMENSION, rerank=INT8_RERANK)
+    if SEARCH_BACKEND == "matryoshka":
+        return MatryoshkaIndex(base, dims=MRL_DIMS, candidates=MRL_CANDIDATES)
+    if SEARCH_BACKEND == "streaming":
+        from .streaming import StreamingIndex
+
+        return StreamingIndex(base, block_rows=STREAM_BLOCK_ROWS)
+    raise ValueError(
+        f"Unknown SEARCH_BACKEND {SEARCH_BACKEND!r}; "
+        "use 'exact', 'ivf', 'int8', 'matryoshka' or 'streaming'."
+    )
+
+
+def get_searcher(provider: str | None = None, catalog: list[dict[str, Any]] | None = None) -> Any:
+    """
+    Search backend selected by SEARCH_BACKEND (exact | ivf | int8 | matryoshka | streaming).
+    With a Catalog snapshot it is built from a fresh load of the store and kept on that
+    snapshot; otherwise it is created once per provider for the process.
+    """
+    provider = provider or EMBED_PROVIDER
+    if isinstance(catalog, Catalog):
+        key = f"searcher:{provider}"
+        if key not in catalog.derived:
+            catalog.derived[key] = _build_searcher(load_index(provider), provider)
+        return catalog.derived[key]
+    if provider not in _searchers:
+        _searchers[provider] = _build_searcher(get_index(provider), provider)
+    return _searchers[provider]
+
+
+def _can_fall_back() -> bool:
+    return EMBED_PROVIDER == "openai" and EMBED_FALLBACK_LOCAL and local_index_available()
+
+
+def get_bm25(catalog: list[dict[str, Any]]) -> BM25Index:
+    """BM25 index over the catalog: kept on a Catalog snapshot, else rebuilt per catalog object."""
+    global _bm25
+    if isinstance(catalog, Catalog):
+        if "bm25" not in catalog.derived:
+            catalog.derived["bm25"] = BM25Index(catalog)
+        return catalog.derived["bm25"]
+    if _bm25 is None or _bm25.products is not catalog:
+        _bm25 = BM25Index(catalog)
+    return _bm25
+
+
+class SearchResultCache:
+    """
+    Bounded LRU of ranked product ids per (normalized query, top_k, filters). One lives on
+    each Catalog snapshot, so a reload (new catalog or index) starts from an empty cache.
+    """
+
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[str, ...]] = OrderedDict()
+
+    @staticmethod
+    def key(query: str, top_k: int, filters: SearchFilters | None) -> tuple:
+        return (
+            normalize_query(query),
+            top_k,
+            None if filters is None or filters.is_empty() else filters.key(),
+        )
+
+    def get(self, key: tuple) -> tuple[str, ...] | None:
+        ids = self._entries.get(key)
+        if ids is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return ids
+
+    def put(self, key: tuple, ids: tuple[str, ...]) -> None:
+        self._entries[key] = ids
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _result_cache(catalog: list[dict[str, Any]]) -> SearchResultCache | None:
+    """The snapshot's result cache; None for plain product lists (no version to key on)."""
+    if SEARCH_CACHE_SIZE <= 0 or not isinstance(catalog, Catalog):
+        return None
+    if "results" not in catalog.derived:
+        catalog.derived["results"] = SearchResultCache()
+    return catalog.derived["results"]
+
+
+def _cached_results(
+    cache: SearchResultCache | None, key: tuple, catalog: Catalog
+) -> list[dict[str, Any]] | None:
+    ids = cache.get(key) if cache is not None else None
+    if ids is None:
+        return None
+    return [catalog.get(pid) for pid in ids]
+
+
+def _cache_results(
+    cache: SearchResultCache | None, key: tuple, results: list[dict[str, Any]], provider: str
+) -> None:
+    # Fallback results are not cached, so popular queries recover once OpenAI is back
+    if cache is not None and provider == EMBED_PROVIDER:
+        cache.put(key, tuple(p["id"] for p in results))
+
+
+def search_cache_stats(catalog: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Hit/miss counters for the live snapshot's result cache (None when disabled)."""
+    cache = _result_cache(catalog)
+    return cache.stats() if cache is not None else None
+
+
+def _index_rows(searcher: Any, catalog: list[dict[str, Any]], provider: str) -> np.ndarray:
+    """
+    Index row of every catalog row (-1 = no embedding), so a catalog bitmap maps to an index
+    bitmap with one gather. Kept on a Catalog snapshot; rebuilt per call for plain lists.
+    """
+    key = f"index_rows:{provider}"
+    if isinstance(catalog, Catalog) and key in catalog.derived:
+        return catalog.derived[key]
+    row_of = getattr(searcher, "row_of", None) or {pid: i for i, pid in enumerate(searcher.ids)}
+    rows = np.fromiter((row_of.get(p["id"], -1) for p in catalog), dtype=np.int64, count=len(catalog))
+    if isinstance(catalog, Catalog):
+        catalog.derived[key] = rows
+    return rows
+
+
+def _catalog_mask(catalog: list[dict[str, Any]], filters: SearchFilters | None) -> np.ndarray | None:
+    """Bitmap over catalog rows passing the filters (None = no filtering)."""
+    if filters is None or filters.is_empty():
+        return None
+    return filters.mask(get_columns(catalog))
+
+
+def _lexical_stage(
+    query: str,
+    catalog: list[dict[str, Any]],
+    top_k: int,
+    mask: np.ndarray | None = None,
+) -> tuple[list[dict[str, Any]] | None, list[dict[str, Any]] | None]:
+    """
+    Returns (final_results, lexical_ranking). final_results is set when no vector search is
+    needed (lexical mode, or a confident BM25 hit in hybrid mode).
+    """
+    if RETRIEVAL_MODE == "vector":
+        return None, None
+    if RETRIEVAL_MODE not in ("hybrid", "lexical"):
+        raise ValueError(
+            f"Unknown RETRIEVAL_MODE {RETRIEVAL_MODE!r}; use 'vector', 'hybrid' or 'lexical'."
+        )
+    bm25 = get_bm25(catalog)
+    rows, scores = bm25.search(query, max(top_k, HYBRID_CANDIDATES), mask)
+    ranking = [catalog[r] for r in rows]
+    if RETRIEVAL_MODE == "lexical" or bm25.is_confident(
+        query, rows, scores, min_coverage=BM25_MIN_COVERAGE, min_margin=BM25_MIN_MARGIN
+    ):
+        return ranking[:top_k], ranking
+    return None, ranking
+
+
+def _vector_stage(
+    provider: str,
+    query_emb: list[float],
+    catalog: list[dict[str, Any]],
+    top_k: int,
+    lexical: list[dict[str, Any]] | None,
+    mask: np.ndarray | None = None,
+) -> list[dict[str, Any]]:
+    searcher = get_searcher(provider, catalog)
+    index_mask = None
+    if mask is not None:
+        rows = _index_rows(searcher, catalog, provider)[mask]
+        index_mask = np.zeros(len(searcher), dtype=bool)
+        index_mask[rows[rows >= 0]] = True
+    vector = rank_products(
+        searcher,
+        query_emb,
+        catalog,
+        top_k=max(top_k, HYBRID_CANDIDATES) if lexical is not None else top_k,
+        min_score=relevance_threshold(provider),
+        mask=index_mask,
+    )
+    return _fuse(vector, lexical, top_k)
+
+
+def _fuse(
+    vector: list[dict[str, Any]],
+    lexical: list[dict[str, Any]] | None,
+    top_k: int,
+) -> list[dict[str, Any]]:
+    """Reciprocal-rank fusion of vector and BM25 results (vector only when lexical is None)."""
+    if lexical is None:
+        return vector[:top_k]
+    by_id = {p["id"]: p for p in lexical}
+    by_id.update((p["id"], p) for p in vector)
+    fused = reciprocal_rank_fusion(
+        [[p["id"] for p in vector], [p["id"] for p in lexical]], k=RRF_K
+    )
+    return [by_id[pid] for pid in fused[:top_k]]
 
 
 def search_products(
     query: str,
     catalog: list[dict[str, Any]],
     top_k: int = 5,
+    filters: SearchFilters | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Product search (vector, hybrid or lexical per RETRIEVAL_MODE), restricted by filters.
+    Results for a Catalog snapshot are cached, so repeats skip the embedding call and scan.
+    """
+    cache = _result_cache(catalog)
+    key = SearchResultCache.key(query, top_k, filters)
+    cached = _cached_results(cache, key, catalog)
+    if cached is not None:
+        return cached
+    mask = _catalog_mask(catalog, filters)
+    if mask is not None and not mask.any():
+        return []
+    results, lexical = _lexical_stage(query, catalog, top_k, mask)
+    provider = EMBED_PROVIDER
+    if results is None:
+        try:
+            query_emb = compute_embedding(query, catalog=catalog)
+        except Exception:
+            if not _can_fall_back():
+                raise
+            provider = "local"
+            query_emb = compute_embedding(query, provider, catalog)
+        results = _vector_stage(provider, query_emb, catalog, top_k, lexical, mask)
+    _cache_results(cache, key, results, provider)
+    return results
+
+
+async def search_products_async(
+    query: str,
+    catalog: list[dict[str, Any]],
+    top_k: int = 5,
+    filters: SearchFilters | None = None,
 ) -> list[dict[str, Any]]:
-    """Semantic search using pre-computed product embeddings + OpenAI query embedding."""
-    return _embedding_search(query, catalog, top_k=top_k)
+    """Non-blocking product search for use from async request handlers.
+    Falls back to the offline local index when the OpenAI call fails."""
+    cache = _result_cache(catalog)
+    key = SearchResultCache.key(query, top_k, filters)
+    cached = _cached_results(cache, key, catalog)
+    if cached is not None:
+        return cached
+    mask = _catalog_mask(catalog, filters)
+    if mask is not None and not mask.any():
+        return []
+    results, lexical = _lexical_stage(query, catalog, top_k, mask)
+    provider = EMBED_PROVIDER
+    if results is None:
+        try:
+            query_emb = await compute_embedding_async(query, catalog=catalog)
+        except Exception:
+            if not _can_fall_back():
+                raise
+            provider = "local"
+            query_emb = await compute_embedding_async(query, provider, catalog)
+        results = _vector_stage(provider, query_emb, catalog, top_k, lexical, mask)
+    _cache_results(cache, key, results, provider)
+    return results
+
+
+async def search_products_batch(
+    queries: list[str],
+    catalog: list[dict[str, Any]],
+    top_k: int = 5,
+) -> list[list[dict[str, Any]]]:
+    """
+    Search many queries at once (evaluation, catalog QA, cache warming). Queries needing
+    vectors are embedded in batched provider calls and scored with one matrix-matrix
+    multiply on the exact backend. Results match search_products per query and populate
+    the same result cache.
+    """
+    cache = _result_cache(catalog)
+    keys = [SearchResultCache.key(q, top_k, None) for q in queries]
+    results: list[list[dict[str, Any]]] = [[] for _ in queries]
+    lexical: list[list[dict[str, Any]] | None] = [None] * len(queries)
+    pending: list[int] = []
+    for i, query in enumerate(queries):
+        cached = _cached_results(cache, keys[i], catalog)
+        if cached is not None:
+            results[i] = cached
+            continue
+        final, lexical[i] = _lexical_stage(query, catalog, top_k)
+        if final is not None:
+            results[i] = final
+            _cache_results(cache, keys[i], final, EMBED_PROVIDER)
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+
+    texts = [queries[i] for i in pending]
+    provider = EMBED_PROVIDER
+    try:
+        query_embs = await compute_embeddings_async(texts, catalog=catalog)
+    except Exception:
+        if not _can_fall_back():
+            raise
+        provider = "local"
+        query_embs = await compute_embeddings_async(texts, provider, catalog)
+
+    vector_k = top_k if RETRIEVAL_MODE == "vector" else max(top_k, HYBRID_CANDIDATES)
+    ranked = rank_products_batch(
+        get_searcher(provider, catalog),
+        query_embs,
+        catalog,
+        top_k=vector_k,
+        min_score=relevance_threshold(provider),
+    )
+    for i, vector in zip(pending, ranked):
+        results[i] = _fuse(vector, lexical[i], top_k)
+        _cache_results(cache, keys[i], results[i], provider)
+    return results
@@ -0,0 +1,119 @@
+"""Versioned catalog + index snapshots with background rebuild and atomic swap (hot reload)."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any
+
+from .catalog import CATALOG_CSVS, Catalog, load_catalog
+from .embedding_store import meta_path
+from .embeddings import (
+    EMBED_FALLBACK_LOCAL,
+    EMBED_PROVIDER,
+    local_embedder_for,
+    local_index_available,
+    store_path_for,
+)
+from .local_embeddings import DEFAULT_EMBEDDER_PATH
+from .retrieval import RETRIEVAL_MODE, get_bm25, get_searcher
+
+# Seconds between checks of catalog CSV / embedding store mtimes (0 disables the watcher)
+SNAPSHOT_WATCH_INTERVAL = float(os.getenv("SNAPSHOT_WATCH_INTERVAL", "0"))
+
+logger = logging.getLogger(__name__)
+
+_current: Catalog = Catalog()
+_loaded_at: float = 0.0
+_fingerprint: tuple = ()
+_generation = 0
+_reload_lock: asyncio.Lock | None = None
+
+
+def _watched_files() -> list:
+    paths = list(CATALOG_CSVS)
+    for provider in ("openai", "local"):
+        # The header is renamed into place last, so its mtime marks a finished store write
+        paths.append(meta_path(store_path_for(provider)))
+    # Refit together with the local store; its IDF must match the one the store was built with
+    paths.append(DEFAULT_EMBEDDER_PATH)
+    return paths
+
+
+def source_fingerprint() -> tuple:
+    """(path, mtime, size) of every input a snapshot is built from."""
+    out = []
+    for path in _watched_files():
+        try:
+            st = path.stat()
+            out.append((str(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            out.append((str(path), None, None))
+    return tuple(out)
+
+
+def current() -> Catalog:
+    """The live snapshot. Grab it once per request and use it throughout."""
+    return _current
+
+
+def info() -> dict[str, Any]:
+    return {"version": _current.version, "loaded_at": _loaded_at, "size": len(_current)}
+
+
+def _next_version() -> str:
+    global _generation
+    _generation += 1
+    return f"{_generation}-{int(time.time())}"
+
+
+def build_snapshot(warm: bool = True) -> Catalog:
+    """
+    Load the catalog and, when `warm`, build its search structures up front so the first
+    request after the swap pays nothing. Blocking: run it off the event loop.
+    """
+    fingerprint = source_fingerprint()
+    snapshot = load_catalog(version=_next_version())
+    snapshot.derived["fingerprint"] = fingerprint
+    if warm:
+        providers = {EMBED_PROVIDER}
+        if EMBED_FALLBACK_LOCAL and local_index_available():
+            providers.add("local")
+        for provider in providers:
+            get_searcher(provider, snapshot)
+        if "local" in providers:
+            local_embedder_for(snapshot)
+        if RETRIEVAL_MODE != "vector":
+            get_bm25(snapshot)
+    return snapshot
+
+
+def install(snapshot: Catalog) -> None:
+    """Atomically make `snapshot` the live one. In-flight requests keep their reference."""
+    global _current, _loaded_at, _fingerprint
+    _fingerprint = snapshot.derived.get("fingerprint", ())
+    _loaded_at = time.time()
+    _current = snapshot
+
+
+async def reload() -> Catalog:
+    """Build a new snapshot in a worker thread, then swap it in. Concurrent calls are serialized."""
+    global _reload_lock
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    async with _reload_lock:
+        snapshot = await asyncio.to_thread(build_snapshot)
+        install(snapshot)
+        return snapshot
+
+
+async def watch(interval: float = SNAPSHOT_WATCH_INTERVAL) -> None:
+    """Poll source files and reload when they change. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if source_fingerprint() != _fingerprint:
+            try:
+                await reload()
+            except Exception as e:
+                # Keep serving the old snapshot; a half-written store is retried next tick
+                logger.warning("Snapshot reload failed: %s", e)
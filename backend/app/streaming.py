@@ -0,0 +1,93 @@
+"""Exact search that streams a memory-mapped embedding matrix in fixed-size blocks."""
+
+import numpy as np
+
+from .embeddings import EmbeddingIndex, _top_rows, _unit
+
+
+def _merge_top(
+    rows: np.ndarray, scores: np.ndarray, new_rows: np.ndarray, new_scores: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Running top-k: keep the k best of the current set plus one block's candidates."""
+    rows = np.concatenate([rows, new_rows])
+    scores = np.concatenate([scores, new_scores])
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    return rows, scores
+
+
+class StreamingIndex:
+    """
+    Brute-force exact search over `base.matrix` (usually a memmapped store) `block_rows`
+    rows at a time, merging each block into a running top-k. Only one block is ever
+    upcast/resident and no N-length score vector is built, so peak memory is
+    O(block_rows * dim + k) regardless of catalog size; the OS page cache holds as much of
+    the store as the container can spare. Results match EmbeddingIndex.search.
+    """
+
+    def __init__(self, base: EmbeddingIndex, block_rows: int = 16384):
+        self.base = base
+        self.ids = base.ids
+        self.mask_for = base.mask_for
+        self.block_rows = max(1, block_rows)
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def _blocks(self, mask: np.ndarray | None):
+        """(row ids, float32 rows) per block, skipping rows the mask excludes."""
+        matrix = self.base.matrix
+        for start in range(0, len(matrix), self.block_rows):
+            stop = min(start + self.block_rows, len(matrix))
+            if mask is None:
+                yield np.arange(start, stop), np.asarray(matrix[start:stop], dtype=np.float32)
+                continue
+            keep = np.flatnonzero(mask[start:stop])
+            if len(keep):
+                yield start + keep, np.asarray(matrix[start + keep], dtype=np.float32)
+
+    def search(
+        self,
+        query_emb: list[float] | np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Exact top-k: (rows, scores), best first. With a row mask only passing rows are read."""
+        q = _unit(query_emb)
+        rows = np.empty(0, dtype=np.intp)
+        scores = np.empty(0, dtype=np.float32)
+        if k <= 0:
+            return rows, scores
+        for block_rows, block in self._blocks(mask):
+            block_scores = block @ q
+            top = _top_rows(block_scores, k)
+            rows, scores = _merge_top(rows, scores, block_rows[top], block_scores[top], k)
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def search_batch(self, query_embs: np.ndarray, k: int) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Exact top-k for many queries: one (queries x block) product per block."""
+        q = np.asarray(query_embs, dtype=np.float32)
+        q = q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-9)
+        k = min(k, len(self))
+        rows = np.empty((len(q), 0), dtype=np.intp)
+        scores = np.empty((len(q), 0), dtype=np.float32)
+        if k <= 0:
+            return list(zip(rows, scores))
+        for block_rows, block in self._blocks(None):
+            block_scores = q @ block.T
+            if block_scores.shape[1] > k:
+                top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+                block_scores = np.take_along_axis(block_scores, top, axis=1)
+                block_rows = block_rows[top]
+            else:
+                block_rows = np.broadcast_to(block_rows, block_scores.shape)
+            rows = np.concatenate([rows, block_rows], axis=1)
+            scores = np.concatenate([scores, block_scores], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                rows = np.take_along_axis(rows, keep, axis=1)
+                scores = np.take_along_axis(scores, keep, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return list(zip(np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)))
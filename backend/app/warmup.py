@@ -0,0 +1,147 @@
+"""Startup warm-up run in the background: search index, connection pools, LLM model, probe query."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any
+
+from . import snapshot
+from .catalog import Catalog
+from .embedding_store import open_store, store_exists
+from .embeddings import EMBED_PROVIDER, compute_embedding_async, store_path_for
+from .llm import warm_up as warm_up_llm
+from .retrieval import RETRIEVAL_MODE, _can_fall_back, get_bm25, get_searcher, search_products_async
+
+# Query run end-to-end through search once everything is loaded
+WARMUP_PROBE_QUERY = os.getenv("WARMUP_PROBE_QUERY", "wireless headphones")
+# Load the chat model at startup (0 = leave it to the first chat)
+WARMUP_LLM = os.getenv("WARMUP_LLM", "1") != "0"
+# Re-hash the embedding store against its header checksum (reads the whole file once)
+WARMUP_VERIFY_STORE = os.getenv("WARMUP_VERIFY_STORE", "1") != "0"
+
+logger = logging.getLogger(__name__)
+
+# component -> {"status": pending|warming|ready|error|skipped, "seconds", "detail"/"error"}
+_components: dict[str, dict[str, Any]] = {}
+_started_at: float | None = None
+_finished_at: float | None = None
+_task: asyncio.Task | None = None
+
+
+def _providers() -> list[str]:
+    providers = [EMBED_PROVIDER]
+    if _can_fall_back():
+        providers.append("local")
+    return providers
+
+
+def _warm_index(catalog: Catalog) -> dict[str, Any]:
+    """Load (and optionally verify) each provider's store and build its searcher on the snapshot."""
+    detail: dict[str, Any] = {}
+    for provider in _providers():
+        path = store_path_for(provider)
+        if WARMUP_VERIFY_STORE and store_exists(path) and not open_store(path).verify():
+            raise ValueError(f"Embedding store {path} does not match its header checksum.")
+        searcher = get_searcher(provider, catalog)
+        # Rows with no embedding can never be returned by vector search
+        missing = len(catalog) - int(searcher.mask_for([p["id"] for p in catalog]).sum())
+        detail[provider] = {"rows": len(searcher), "missing_products": missing}
+    if RETRIEVAL_MODE != "vector":
+        detail["bm25_terms"] = len(get_bm25(catalog).idf)
+    return detail
+
+
+async def _warm_embeddings() -> dict[str, Any] | None:
+    """One real embedding call: opens the pooled OpenAI connection and seeds the query cache."""
+    if EMBED_PROVIDER != "openai":
+        return None
+    emb = await compute_embedding_async(WARMUP_PROBE_QUERY)
+    return {"dim": len(emb)}
+
+
+async def _warm_llm() -> dict[str, Any]:
+    return {"model": await warm_up_llm()}
+
+
+async def _probe(catalog: Catalog) -> dict[str, Any]:
+    results = await search_products_async(WARMUP_PROBE_QUERY, catalog, top_k=5)
+    return {"query": WARMUP_PROBE_QUERY, "results": len(results)}
+
+
+async def _run(name: str, step) -> bool:
+    """Run one warm-up step, recording its status and wall time. Never raises."""
+    entry = _components[name]
+    entry["status"] = "warming"
+    start = time.perf_counter()
+    try:
+        detail = await step()
+        entry["status"] = "ready"
+        if detail is not None:
+            entry["detail"] = detail
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = str(e)
+        logger.warning("Warm-up step %s failed: %s", name, e)
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry["status"] == "ready"
+
+
+async def warm_up(catalog: Catalog) -> None:
+    """Index -> embeddings -> probe in order; the LLM is primed concurrently."""
+    global _started_at, _finished_at
+    _started_at, _finished_at = time.time(), None
+    names = ["index", "embeddings", "probe", "llm"]
+    _components.clear()
+    for name in names:
+        _components[name] = {"status": "pending", "seconds": None}
+    if not WARMUP_LLM:
+        _components["llm"]["status"] = "skipped"
+
+    async def retrieval() -> None:
+        if await _run("index", lambda: asyncio.to_thread(_warm_index, catalog)):
+            await _run("embeddings", _warm_embeddings)
+            await _run("probe", lambda: _probe(catalog))
+        else:
+            _components["embeddings"]["status"] = _components["probe"]["status"] = "skipped"
+
+    steps = [retrieval()]
+    if WARMUP_LLM:
+        steps.append(_run("llm", _warm_llm))
+    await asyncio.gather(*steps)
+    _finished_at = time.time()
+
+
+def init_in_background(catalog: Catalog) -> asyncio.Task:
+    """Start warm-up on the running event loop; the app keeps serving while it runs."""
+    global _task
+    _task = asyncio.create_task(warm_up(catalog))
+    return _task
+
+
+def is_ready() -> bool:
+    """
+    True once the live snapshot has its search index built, by the warm-up index step or
+    a later reload. Later steps failing degrades, but doesn't block, chat.
+    """
+    return f"searcher:{EMBED_PROVIDER}" in snapshot.current().derived
+
+
+def status() -> str:
+    if _finished_at is None:
+        return "warming_up"
+    # A failed startup index step is superseded once a reload installs a built index
+    failed = any(c["status"] == "error" for name, c in _components.items() if name != "index")
+    return "degraded" if failed or not is_ready() else "ok"
+
+
+def info() -> dict[str, Any]:
+    """Per-component readiness and timings for /api/health."""
+    total = None
+    if _started_at is not None:
+        total = round((_finished_at or time.time()) - _started_at, 3)
+    return {
+        "finished": _finished_at is not None,
+        "seconds": total,
+        "components": {name: dict(entry) for name, entry in _components.items()},
+    }
@@ -0,0 +1,50 @@
+"""
+Convert the legacy data/product_embeddings.json into the binary embedding store.
+
+Run from the backend/ directory:
+    python convert_embeddings.py [--input data/product_embeddings.json] [--dtype float16]
+
+Output: data/product_embeddings.meta.json + the .<version>.npy / .ids.json it names
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+
+from app.embedding_store import DEFAULT_STORE_PATH, SUPPORTED_DTYPES, open_store, write_store
+
+EMBED_MODEL = "text-embedding-3-small"
+DEFAULT_INPUT = Path(__file__).parent / "data" / "product_embeddings.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--output", type=Path, default=DEFAULT_STORE_PATH)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    parser.add_argument("--model", default=EMBED_MODEL, help="Model the JSON embeddings came from")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"ERROR: {args.input} not found")
+        sys.exit(1)
+
+    print(f"Reading {args.input}...")
+    with open(args.input) as f:
+        embeddings: dict[str, list[float]] = json.load(f)
+
+    ids = list(embeddings)
+    matrix = np.array([embeddings[pid] for pid in ids], dtype=np.float32)
+    meta = write_store(ids, matrix, args.model, args.output, dtype=args.dtype)
+
+    store = open_store(args.output, verify=True)
+    print(f"Saved {len(store)} x {store.dim} {meta['dtype']} embeddings to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Regression check for the local intent classifier (app/intent.py) on labelled messages.
+
+Run from the backend/ directory:
+    python eval_intent.py [--verbose]
+
+Reports how many messages the classifier decides locally (confidence >= INTENT_MIN_CONFIDENCE)
+and how many of those it gets wrong; the rest go to the LLM. Exits 1 on any confident
+misclassification, so tune INTENT_* thresholds or rules against it.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.catalog import load_catalog
+from app.intent import INTENT_MIN_CONFIDENCE, classify_intent
+
+# (message, expected intent). Keep phrasings out of intent.EXAMPLES so this measures generalization.
+CASES = [
+    ("hello", "CHAT"),
+    ("hey there", "CHAT"),
+    ("good night", "CHAT"),
+    ("what's up", "CHAT"),
+    ("that's cool", "CHAT"),
+    ("thanks a lot", "CHAT"),
+    ("what are your features?", "CHAT"),
+    ("tell me about your features", "CHAT"),
+    ("are you better than alexa?", "CHAT"),
+    ("is it going to rain", "CHAT"),
+    ("how are you doing today", "CHAT"),
+    ("lol that's funny", "CHAT"),
+    ("what is the meaning of life", "CHAT"),
+    ("who built this assistant", "CHAT"),
+    ("can you help me out", "CHAT"),
+    ("tell me about yourself please", "CHAT"),
+    ("I need help", "CHAT"),
+    ("what's the weather today", "CHAT"),
+    ("do you like music", "CHAT"),
+    ("you are awesome", "CHAT"),
+    ("see you later", "CHAT"),
+    ("what languages do you speak", "CHAT"),
+    ("are you a real person", "CHAT"),
+    ("what time is it", "CHAT"),
+    ("sorry, never mind", "CHAT"),
+    ("hi, I need shoes", "SEARCH"),
+    ("red sneakers", "SEARCH"),
+    ("bluetooth earbuds", "SEARCH"),
+    ("something for my mom's birthday", "SEARCH"),
+    ("do you sell yoga mats", "SEARCH"),
+    ("kids lego set", "SEARCH"),
+    ("tell me more about the first", "SEARCH"),
+    ("tell me about the second", "SEARCH"),
+    ("tell me more", "SEARCH"),
+    ("what about that one", "SEARCH"),
+    ("is it waterproof", "SEARCH"),
+    ("does it come with a charger", "SEARCH"),
+    ("what's the difference between them", "SEARCH"),
+    ("mens hoodie", "SEARCH"),
+    ("4k tv", "SEARCH"),
+    ("a water bottle for hiking", "SEARCH"),
+    ("how is the battery life", "SEARCH"),
+    ("Recommend me a t-shirt for sports", "SEARCH"),
+    ("best laptop for students", "SEARCH"),
+    ("do you know anything about cameras", "SEARCH"),
+    ("any good headphones", "SEARCH"),
+    ("portable charger", "SEARCH"),
+    ("winter boots for women", "SEARCH"),
+    ("I'm looking for a desk lamp", "SEARCH"),
+    ("what do you have for camping", "SEARCH"),
+    ("got any board games", "SEARCH"),
+    ("smart watch", "SEARCH"),
+    ("coffee grinder", "SEARCH"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="Print every message, not just errors")
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    local = wrong = 0
+    for message, expected in CASES:
+        intent, confidence = classify_intent(message, catalog)
+        decided = confidence >= INTENT_MIN_CONFIDENCE
+        local += decided
+        mark = "llm" if not decided else ("ok" if intent == expected else "WRONG")
+        wrong += mark == "WRONG"
+        if args.verbose or mark == "WRONG":
+            print(f"  {mark:5} {expected:6} -> {intent:6} {confidence:.3f}  {message!r}")
+
+    print(
+        f"{len(CASES)} messages: {local} decided locally, {wrong} of them wrong, "
+        f"{len(CASES) - local} sent to the LLM"
+    )
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 """
-One-time script: pre-compute product embeddings using OpenAI and save to JSON.
+One-time script: pre-compute product embeddings and save them as a binary store.
 
 Run once from the backend/ directory:
-    python precompute_embeddings.py
+    python precompute_embeddings.py [--dtype float16]
+    python precompute_embeddings.py --incremental      # re-embed only new/changed products
+    python precompute_embeddings.py --provider local   # offline, no API key needed
+    python precompute_embeddings.py --concurrency 8    # parallel batch requests
 
-Output: data/product_embeddings.json  (commit this file to the repo)
+OpenAI runs send token-budgeted batches concurrently, back off on 429/5xx, and checkpoint
+newly finished vectors as shards in data/product_embeddings.checkpoint/. Re-running after an
+interruption merges the shards and resumes; they are deleted once the store is written.
+
+Output (openai): data/product_embeddings.meta.json + the .<version>.npy / .ids.json it names
+Output (local):  data/product_embeddings_local.* + data/local_embedder.npz
+(commit these files to the repo)
 """
 
-import json
+import argparse
+import asyncio
 import os
+import random
+import shutil
 import sys
 from pathlib import Path
 
@@ -17,26 +29,230 @@ sys.path.insert(0, str(Path(__file__).parent))
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent / ".env")
 
+import numpy as np
+
+# Exact token counts when available; otherwise a ~4 chars/token estimate
 try:
-    from openai import OpenAI
+    import tiktoken
 except ImportError:
-    print("ERROR: openai package not installed. Run: pip install openai")
-    sys.exit(1)
+    tiktoken = None  # type: ignore
 
 from app.catalog import load_catalog, get_searchable_text
+from app.embedding_store import (
+    DEFAULT_STORE_PATH,
+    LOCAL_STORE_PATH,
+    SUPPORTED_DTYPES,
+    content_hash,
+    open_store,
+    store_exists,
+    write_store,
+)
+from app.local_embeddings import DEFAULT_EMBEDDER_PATH, LOCAL_EMBED_MODEL, LocalEmbedder
 
 EMBED_MODEL = "text-embedding-3-small"
-OUTPUT_PATH = Path(__file__).parent / "data" / "product_embeddings.json"
-BATCH_SIZE = 100
+OUTPUT_PATH = DEFAULT_STORE_PATH
+CHECKPOINT_DIR = OUTPUT_PATH.with_suffix(".checkpoint")
+BATCH_SIZE = 100  # max inputs per request
+MAX_BATCH_TOKENS = 100_000  # per-request token budget (API limit is 300k)
+MAX_INPUT_TOKENS = 8191  # per-input limit of text-embedding-3-*
+CONCURRENCY = 4
+MAX_RETRIES = 6
+CHECKPOINT_EVERY = 10  # batches
 
 
-def main():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+def _token_counter():
+    if tiktoken is not None:
+        enc = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(enc.encode(text))
+    return lambda text: len(text) // 4 + 1
+
+
+def _make_batches(texts: list[str], max_items: int, max_tokens: int) -> list[list[int]]:
+    """Group text indices greedily so each request stays under both the item and token budget."""
+    count = _token_counter()
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = min(count(text), MAX_INPUT_TOKENS)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _load_checkpoint(model: str) -> dict[str, np.ndarray]:
+    """Vectors finished by interrupted runs, merged from every shard and keyed by content hash."""
+    done: dict[str, np.ndarray] = {}
+    for shard in sorted(CHECKPOINT_DIR.glob("shard-*.npz")):
+        with np.load(shard) as data:
+            if str(data["model"]) == model:
+                done.update(zip(data["hashes"].tolist(), data["vectors"]))
+    return done
+
+
+def _save_checkpoint(new: dict[str, np.ndarray], model: str) -> None:
+    """Append the vectors finished since the last save as one shard, then forget them."""
+    if not new:
+        return
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    shard = CHECKPOINT_DIR / f"shard-{len(list(CHECKPOINT_DIR.glob('shard-*.npz'))):05d}.npz"
+    tmp = shard.with_name("." + shard.name)  # not matched by the shard glob until renamed
+    np.savez(tmp, model=np.array(model), hashes=np.array(list(new)), vectors=np.stack(list(new.values())))
+    os.replace(tmp, shard)
+    new.clear()
+
+
+def _is_transient(e: Exception) -> tuple[bool, float | None]:
+    """(retryable, server-suggested delay) for rate limits, timeouts and 5xx."""
+    import openai
+
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True, None
+    if isinstance(e, openai.APIStatusError):
+        if e.status_code in (408, 409, 429) or e.status_code >= 500:
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            try:
+                return True, float(retry_after) if retry_after else None
+            except ValueError:
+                return True, None
+    return False, None
+
+
+async def _embed_batch(client, texts: list[str], sem: asyncio.Semaphore, max_retries: int) -> list[list[float]]:
+    """One embeddings request with exponential backoff + jitter on transient errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            async with sem:
+                response = await client.embeddings.create(model=EMBED_MODEL, input=texts)
+            return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
+        except Exception as e:
+            retryable, retry_after = _is_transient(e)
+            if not retryable or attempt == max_retries:
+                raise
+            delay = retry_after or min(60.0, 2**attempt) * (0.5 + random.random())
+            print(f"  {type(e).__name__}; retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def _embed_openai_async(texts: list[str], args: argparse.Namespace) -> np.ndarray:
+    from openai import AsyncOpenAI
+
+    hashes = [content_hash(t) for t in texts]
+    done = _load_checkpoint(EMBED_MODEL)
+    if done:
+        print(f"  Resuming: {sum(h in done for h in hashes)}/{len(texts)} already in checkpoint")
+    todo = [i for i, h in enumerate(hashes) if h not in done]
+    batches = _make_batches([texts[i] for i in todo], args.batch_size, args.max_batch_tokens)
+    batches = [[todo[j] for j in batch] for batch in batches]
+
+    print(
+        f"Computing embeddings with {EMBED_MODEL}: {len(todo)} texts in {len(batches)} batches, "
+        f"{args.concurrency} concurrent..."
+    )
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    sem = asyncio.Semaphore(args.concurrency)
+
+    unsaved: dict[str, np.ndarray] = {}
+
+    async def run(batch: list[int]) -> list[int]:
+        vectors = await _embed_batch(client, [texts[i] for i in batch], sem, args.max_retries)
+        for i, vec in zip(batch, vectors):
+            done[hashes[i]] = unsaved[hashes[i]] = np.asarray(vec, dtype=np.float32)
+        return batch
+
+    finished = 0
+    try:
+        for fut in asyncio.as_completed([run(b) for b in batches]):
+            await fut
+            finished += 1
+            if finished % args.checkpoint_every == 0:
+                _save_checkpoint(unsaved, EMBED_MODEL)
+            print(f"  {finished}/{len(batches)} batches done")
+    finally:
+        # Keep partial progress on errors or Ctrl-C so the next run resumes
+        if finished < len(batches):
+            _save_checkpoint(unsaved, EMBED_MODEL)
+            print(f"  Checkpoint saved to {CHECKPOINT_DIR}")
+        await client.close()
+
+    return np.stack([done[h] for h in hashes]) if texts else np.empty((0, 0), np.float32)
+
+
+def _embed_openai(texts: list[str], args: argparse.Namespace) -> np.ndarray:
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        print("ERROR: openai package not installed. Run: pip install openai")
+        sys.exit(1)
+
+    if not os.getenv("OPENAI_API_KEY"):
         print("ERROR: OPENAI_API_KEY not set in .env")
         sys.exit(1)
 
-    client = OpenAI(api_key=api_key)
+    return asyncio.run(_embed_openai_async(texts, args))
+
+
+def _reusable_rows(ids: list[str], hashes: list[str], model: str) -> dict[str, np.ndarray]:
+    """Stored vectors whose product text and model are unchanged, keyed by product id."""
+    if not store_exists(OUTPUT_PATH):
+        print("  No existing store; embedding everything.")
+        return {}
+    store = open_store(OUTPUT_PATH)
+    if store.model != model or store.hashes is None:
+        print(f"  Existing store was built by {store.model!r} without matching hashes; embedding everything.")
+        return {}
+    wanted = dict(zip(ids, hashes))
+    return {
+        pid: np.asarray(store.matrix[row], dtype=np.float32)
+        for row, (pid, h) in enumerate(zip(store.ids, store.hashes))
+        if wanted.get(pid) == h
+    }
+
+
+def _embed_openai_incremental(
+    ids: list[str], texts: list[str], hashes: list[str], args: argparse.Namespace
+) -> np.ndarray:
+    """Reuse unchanged rows from the current store; embed only new or edited products."""
+    reusable = _reusable_rows(ids, hashes, EMBED_MODEL)
+    todo = [i for i, pid in enumerate(ids) if pid not in reusable]
+    previous = set(open_store(OUTPUT_PATH).ids) if store_exists(OUTPUT_PATH) else set()
+    dropped = len(previous - set(ids))
+    print(f"  {len(reusable)} unchanged, {len(todo)} new/changed, {dropped} deleted")
+
+    fresh = _embed_openai([texts[i] for i in todo], args) if todo else np.empty((0, 0), np.float32)
+    fresh_by_id = {ids[i]: fresh[j] for j, i in enumerate(todo)}
+    return np.stack([reusable[pid] if pid in reusable else fresh_by_id[pid] for pid in ids])
+
+
+def _embed_local(texts: list[str]) -> np.ndarray:
+    print(f"Fitting {LOCAL_EMBED_MODEL} on {len(texts)} products...")
+    embedder = LocalEmbedder().fit(texts)
+    embedder.save(DEFAULT_EMBEDDER_PATH)
+    print(f"  Saved embedder to {DEFAULT_EMBEDDER_PATH}")
+    return embedder.embed_batch(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    parser.add_argument("--provider", choices=("openai", "local"), default="openai")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep stored vectors whose product text and model are unchanged (openai only)",
+    )
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Parallel batch requests")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Max inputs per request")
+    parser.add_argument("--max-batch-tokens", type=int, default=MAX_BATCH_TOKENS, help="Token budget per request")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES, help="Retries on 429/5xx/timeouts")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY, help="Batches per checkpoint")
+    args = parser.parse_args()
 
     print("Loading catalog...")
     catalog = load_catalog()
@@ -44,25 +260,22 @@ def main():
 
     texts = [get_searchable_text(p) for p in catalog]
     ids = [p["id"] for p in catalog]
+    hashes = [content_hash(t) for t in texts]
 
-    print(f"Computing embeddings with {EMBED_MODEL} (batches of {BATCH_SIZE})...")
-    all_embeddings: list[list[float]] = []
-
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch = texts[i : i + BATCH_SIZE]
-        response = client.embeddings.create(model=EMBED_MODEL, input=batch)
-        batch_embeddings = [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
-        all_embeddings.extend(batch_embeddings)
-        print(f"  {min(i + BATCH_SIZE, len(texts))}/{len(texts)} done")
-
-    output = {pid: emb for pid, emb in zip(ids, all_embeddings)}
+    if args.provider == "local":
+        # IDF is refit on the whole catalog, so every local vector changes anyway
+        matrix, model, output_path = _embed_local(texts), LOCAL_EMBED_MODEL, LOCAL_STORE_PATH
+    elif args.incremental:
+        matrix, model, output_path = _embed_openai_incremental(ids, texts, hashes, args), EMBED_MODEL, OUTPUT_PATH
+    else:
+        matrix, model, output_path = _embed_openai(texts, args), EMBED_MODEL, OUTPUT_PATH
 
-    OUTPUT_PATH.parent.mkdir(exist_ok=True)
-    with open(OUTPUT_PATH, "w") as f:
-        json.dump(output, f)
+    meta = write_store(ids, matrix, model, output_path, dtype=args.dtype, hashes=hashes)
+    if output_path == OUTPUT_PATH and CHECKPOINT_DIR.exists():
+        shutil.rmtree(CHECKPOINT_DIR)
 
-    print(f"\nSaved {len(output)} embeddings to {OUTPUT_PATH}")
-    print("Done! Commit data/product_embeddings.json to your repo.")
+    print(f"\nSaved {meta['count']} x {meta['dim']} {meta['dtype']} embeddings to {output_path}")
+    print(f"Done! Commit {output_path.parent.name}/{output_path.stem}.* to your repo.")
 
 
 if __name__ == "__main__":